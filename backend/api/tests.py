@@ -0,0 +1,579 @@
+"""
+Tests of the `api' app.
+"""
+from unittest import mock, skipIf, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.v1.filters import search_recipes, search_similar
+from api.v1.pagination import CountCachingPaginator
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+
+User = get_user_model()
+
+PAGE_SIZES = (1, 100)
+
+
+class RecipeListQueriesTest(TestCase):
+    """The recipe list is read by a constant number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Author',
+            last_name='Author',
+            password='password',
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            )
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='g'
+            )
+            for i in range(3)
+        ]
+        for i in range(max(PAGE_SIZES)):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}',
+                author=cls.user,
+                text='text',
+                cooking_time=1,
+                image='recipes/recipe.jpg',
+            )
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in ingredients
+            )
+
+    def assert_list_queries(self, client, num):
+        # PostgreSQL reads the planner estimate before the exact count.
+        num += connection.vendor == 'postgresql'
+        for page_size in PAGE_SIZES:
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(num):
+                    response = client.get(
+                        '/api/recipes/', {'limit': page_size}
+                    )
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_anonymous_list_queries(self):
+        # Count, recipes with authors, tags, ingredient rows.
+        self.assert_list_queries(APIClient(), 4)
+
+    def test_authenticated_list_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # The followed authors of the user are loaded once.
+        self.assert_list_queries(client, 5)
+
+    def test_cursor_pages(self):
+        # Equal dates are ordered by the id tiebreaker.
+        Recipe.objects.update(pub_date=Recipe.objects.first().pub_date)
+        client = APIClient()
+        url, pages = '/api/recipes/?cursor=&limit=7', []
+        while url:
+            response = client.get(url)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data['next']
+        recipe_ids = [recipe_id for page in pages for recipe_id in page]
+        self.assertEqual(
+            recipe_ids,
+            list(Recipe.objects.order_by('-id').values_list('id', flat=True)),
+        )
+        self.assertEqual(len(pages), -(-max(PAGE_SIZES) // 7))
+
+    @mock.patch('api.v1.pagination.is_cache_shared', return_value=True)
+    def test_cached_count(self, is_cache_shared):
+        cache.clear()
+        client = APIClient()
+        client.get('/api/recipes/', {'limit': 1})
+        # The cached count saves the count and estimate queries.
+        with self.assertNumQueries(3):
+            response = client.get('/api/recipes/', {'limit': 1})
+        self.assertEqual(response.data['count'], max(PAGE_SIZES))
+        self.assertTrue(response.data['count_is_exact'])
+        Recipe.objects.create(
+            name='recipe',
+            author=self.user,
+            text='text',
+            cooking_time=1,
+            image='recipes/recipe.jpg',
+        )
+        response = client.get('/api/recipes/', {'limit': 1})
+        self.assertEqual(response.data['count'], max(PAGE_SIZES) + 1)
+
+    @mock.patch('api.v1.pagination.is_cache_shared', return_value=True)
+    @mock.patch.object(
+        CountCachingPaginator, 'get_estimated_count', return_value=10 ** 6
+    )
+    def test_cached_estimate(self, get_estimated_count, is_cache_shared):
+        cache.clear()
+        client = APIClient()
+        for _ in range(2):
+            response = client.get('/api/recipes/', {'limit': 1})
+            self.assertEqual(response.data['count'], 10 ** 6)
+            self.assertFalse(response.data['count_is_exact'])
+        get_estimated_count.assert_called_once()
+
+
+class RecipeImageTest(TestCase):
+    """Recipe images are validated before they are decoded and saved."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Author',
+            last_name='Author',
+            password='password',
+        )
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='g'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, image):
+        return self.client.post('/api/recipes/', {
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 1}],
+            'name': 'recipe',
+            'text': 'text',
+            'cooking_time': 1,
+            'image': image,
+        }, format='json')
+
+    def test_empty_image(self):
+        response = self.create_recipe('')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data, {'image': ['Add recipe image!']}
+        )
+
+    @override_settings(IMAGE_MAX_BYTES=3)
+    def test_large_image(self):
+        response = self.create_recipe('data:image/png;base64,' + 'A' * 8)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {'image': ['The image must not be larger than 3 bytes.']},
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+
+class IngredientSearchTest(TestCase):
+    """Ingredient searches by name and by similar names."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Мёд', 'Медовик', 'Гречишный мед', 'Молоко'):
+            Ingredient.objects.create(name=name, measurement_unit='g')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_names(self, **params):
+        response = APIClient().get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_name(self):
+        self.assertEqual(
+            self.get_names(name='мед'), ['Мёд', 'Медовик', 'Гречишный мед']
+        )
+
+    def test_database(self):
+        self.assertEqual(len(self.get_names()), 4)
+        self.assertIn('Молоко', self.get_names(fuzzy='Молоко'))
+
+
+class SearchTest(TestCase):
+    """Similarity and full-text searches with their fallbacks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Author',
+            last_name='Author',
+            password='password',
+        )
+        cls.beet = Ingredient.objects.create(
+            name='Свекла', measurement_unit='g'
+        )
+        cls.flour = Ingredient.objects.create(
+            name='Мука', measurement_unit='g'
+        )
+        cls.recipes = {}
+        for name, text, ingredient in (
+            ('Борщ', 'Красный суп со сметаной', cls.beet),
+            ('Блины', 'Тонкие блины на молоке', cls.flour),
+            ('Салат', 'Салат к борщу', cls.flour),
+        ):
+            recipe = Recipe.objects.create(
+                name=name,
+                author=author,
+                text=text,
+                cooking_time=1,
+                image='recipes/recipe.jpg',
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+            cls.recipes[name] = recipe
+
+    def search_recipes(self, value):
+        return list(search_recipes(Recipe.objects.all(), value))
+
+    def search_similar(self, model, value):
+        return list(search_similar(model.objects.all(), 'name', value))
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL searches')
+    def test_substring_fallback(self):
+        # SQLite ignores the case of ASCII letters only.
+        self.assertEqual(
+            self.search_similar(Ingredient, 'векл'), [self.beet]
+        )
+        self.assertEqual(
+            set(self.search_recipes('орщ')),
+            {self.recipes['Борщ'], self.recipes['Салат']},
+        )
+        self.assertEqual(
+            self.search_recipes('Свекла'), [self.recipes['Борщ']]
+        )
+        self.assertEqual(self.search_recipes('молоке'), [
+            self.recipes['Блины']
+        ])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+    def test_similarity(self):
+        self.assertEqual(
+            self.search_similar(Ingredient, 'Свёкла'), [self.beet]
+        )
+        self.assertEqual(
+            self.search_similar(Recipe, 'Борш'), [self.recipes['Борщ']]
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+    def test_full_text(self):
+        # Word forms match and the name ranks above the text.
+        self.assertEqual(self.search_recipes('блинами'), [
+            self.recipes['Блины']
+        ])
+        self.assertEqual(
+            self.search_recipes('свеклой'), [self.recipes['Борщ']]
+        )
+        self.assertEqual(
+            self.search_recipes('борщ'),
+            [self.recipes['Борщ'], self.recipes['Салат']],
+        )
+        self.assertEqual(self.search_recipes('молоко -блины'), [])
+
+
+class ShoppingListDownloadTest(TestCase):
+    """The shopping list is downloaded as a file, errors as JSON."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='User',
+            last_name='User',
+            password='password',
+        )
+        cls.recipe = Recipe.objects.create(
+            name='recipe',
+            author=cls.user,
+            text='text',
+            cooking_time=1,
+            image='recipes/recipe.jpg',
+        )
+        IngredientInRecipe.objects.create(
+            recipe=cls.recipe,
+            ingredient=Ingredient.objects.create(
+                name='ingredient', measurement_unit='g'
+            ),
+            amount=5,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_json_error(self, response, status_code):
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_errors(self):
+        for file_format in ('txt', 'csv', 'json'):
+            with self.subTest(format=file_format):
+                response = APIClient().get(self.url, {'format': file_format})
+                self.assert_json_error(response, 401)
+                self.assertIn('detail', response.json())
+                response = self.client.get(self.url, {'format': file_format})
+                self.assert_json_error(response, 400)
+                self.assertIn('shopping_cart', response.json())
+
+    def test_download(self):
+        self.client.post(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'text/csv; charset=utf-8'
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['name,amount,measurement_unit', 'ingredient,5,g'],
+        )
+
+
+class BulkRecipesTest(TestCase):
+    """Lists of recipes are added and removed by one request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='User',
+            last_name='User',
+            password='password',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='g'
+        )
+        cls.recipes = []
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}',
+                author=cls.user,
+                text='text',
+                cooking_time=1,
+                image='recipes/recipe.jpg',
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=i + 1
+            )
+            cls.recipes.append(recipe.pk)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def change(self, method, action, recipe_ids):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{action}/', {'recipes': recipe_ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (result['id'], result['status'])
+            for result in response.data['results']
+        ]
+
+    def get_counters(self, field):
+        return list(
+            Recipe.objects.filter(
+                pk__in=self.recipes
+            ).order_by('pk').values_list(field, flat=True)
+        )
+
+    def test_bulk_favorite(self):
+        first, second, third = self.recipes
+        missing = third + 1
+        Favorite.objects.create(user=self.user, recipe_id=second)
+        self.assertEqual(
+            self.change(
+                'post', 'bulk_favorite', [first, second, missing, first]
+            ),
+            [
+                (first, 'added'),
+                (second, 'already_added'),
+                (missing, 'not_found'),
+            ],
+        )
+        self.assertEqual(self.get_counters('favorites_count'), [1, 1, 0])
+        self.assertEqual(
+            self.change('delete', 'bulk_favorite', [first, third]),
+            [(first, 'removed'), (third, 'not_in_list')],
+        )
+        self.assertEqual(self.get_counters('favorites_count'), [0, 1, 0])
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe', flat=True)),
+            [second],
+        )
+
+    def test_bulk_shopping_cart(self):
+        self.assertEqual(
+            self.change('post', 'bulk_shopping_cart', self.recipes),
+            [(pk, 'added') for pk in self.recipes],
+        )
+        self.assertEqual(self.get_counters('in_carts_count'), [1, 1, 1])
+        response = self.client.get('/api/recipes/shopping_cart_summary/')
+        self.assertEqual(response.data[0]['amount'], 6)
+        self.change('delete', 'bulk_shopping_cart', self.recipes[:2])
+        self.assertEqual(self.get_counters('in_carts_count'), [0, 0, 1])
+        response = self.client.get('/api/recipes/shopping_cart_summary/')
+        self.assertEqual(response.data[0]['amount'], 3)
+        self.assertEqual(ShoppingCart.objects.count(), 1)
+
+    def test_invalid_requests(self):
+        for recipe_ids in ([], ['id'], [0], [1] * 1000, None):
+            with self.subTest(recipes=recipe_ids):
+                response = self.client.post(
+                    '/api/recipes/bulk_favorite/',
+                    {'recipes': recipe_ids},
+                    format='json',
+                )
+                self.assertEqual(response.status_code, 400)
+        response = APIClient().post(
+            '/api/recipes/bulk_favorite/',
+            {'recipes': self.recipes},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Favorite.objects.exists())
+
+
+class RecipeUpdateTest(TestCase):
+    """Recipe tags and ingredients are updated by their difference."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Author',
+            last_name='Author',
+            password='password',
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            )
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='g'
+            )
+            for i in range(4)
+        ]
+        cls.recipe = Recipe.objects.create(
+            name='recipe',
+            author=cls.user,
+            text='text',
+            cooking_time=1,
+            image='recipes/recipe.jpg',
+        )
+        cls.recipe.tags.set(cls.tags[:2])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in zip(cls.ingredients, (1, 2, 3))
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def update(self, data):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/', data, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def get_rows(self):
+        return {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in self.recipe.amount.values_list(
+                'pk', 'ingredient', 'amount'
+            )
+        }
+
+    def test_ingredients(self):
+        first, second, third, fourth = (
+            ingredient.pk for ingredient in self.ingredients
+        )
+        rows = self.get_rows()
+        self.update({'ingredients': [
+            {'id': first, 'amount': 1},
+            {'id': second, 'amount': 5},
+            {'id': fourth, 'amount': 4},
+        ]})
+        new_rows = self.get_rows()
+        self.assertEqual(set(new_rows), {first, second, fourth})
+        self.assertEqual(new_rows[first], rows[first])
+        self.assertEqual(new_rows[second], (rows[second][0], 5))
+        self.assertEqual(new_rows[fourth][1], 4)
+        self.assertEqual(
+            dict(ShoppingListItem.objects.values_list(
+                'ingredient', 'total_amount'
+            )),
+            {first: 1, second: 5, fourth: 4},
+        )
+
+    def test_unchanged(self):
+        rows = self.get_rows()
+        with CaptureQueriesContext(connection) as queries:
+            self.update({
+                'name': 'new name',
+                'tags': [tag.pk for tag in self.tags[:2]],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': amount}
+                    for ingredient_id, (_, amount) in rows.items()
+                ],
+            })
+        # Only the name of the recipe is written.
+        writes = [
+            query['sql'].split(' SET ')[0]
+            for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(writes, ['UPDATE "recipes_recipe"'])
+        self.assertEqual(self.get_rows(), rows)
+        self.update({'name': 'other name'})
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_tags(self):
+        self.update({'tags': [self.tags[1].pk, self.tags[2].pk]})
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            list(self.recipe.tags.order_by('pk')), self.tags[1:]
+        )
+        self.assertEqual(
+            self.recipe.tags_mask,
+            Recipe.get_tags_mask([tag.pk for tag in self.tags[1:]]),
+        )
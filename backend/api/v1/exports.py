@@ -0,0 +1,76 @@
+"""
+Streaming shopping list exports.
+
+Each export is a generator of encoded chunks, rows of the shopping list
+are formatted one by one while the database cursor is iterated.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+
+ENCODING = 'utf-8'
+
+
+def export_txt(ingredients):
+    """Shopping list as plain text lines."""
+    today = datetime.today()
+    yield (
+        f'FoodGram Service\n'
+        f'Today date.: {today:%Y-%m-%d}\n'
+        f'Your shopping list.:\n'
+    ).encode(ENCODING)
+    for ingredient in ingredients:
+        yield (
+            f'- {ingredient["name"]} - {ingredient["amount"]} '
+            f'{ingredient["measurement_unit"]}\n'
+        ).encode(ENCODING)
+
+
+class Echo:
+    """File-like object returning the written value, used by 'csv.writer'."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(ingredients):
+    """Shopping list as CSV rows."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('name', 'amount', 'measurement_unit')
+    ).encode(ENCODING)
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['amount'],
+            ingredient['measurement_unit'],
+        )).encode(ENCODING)
+
+
+def export_json(ingredients):
+    """Shopping list as a JSON array of objects."""
+    separator = b'['
+    for ingredient in ingredients:
+        yield separator + json.dumps(
+            ingredient, ensure_ascii=False
+        ).encode(ENCODING)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+EXPORTS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'json': export_json,
+}
+
+
+def gzip_stream(chunks):
+    """Compresses the chunks into a gzip file on the fly."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,157 @@
+"""
+Relational fields resolving lists of primary keys by one query
+and fields of recipe images.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field resolving all keys of a list by one IN query.
+
+    With 'many=True' the keys of the list are resolved together.
+    In the items of a 'BulkRelatedListSerializer' the field returns
+    the key and the list serializer resolves the keys of all items.
+    All missing keys are reported by one validation error.
+    """
+
+    default_error_messages = {
+        'does_not_exist': 'Objects do not exist: {pk_value}.',
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        """Converts the input to a primary key without querying."""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def resolve(self, pks):
+        """Fetches the objects of the keys, preserving their order."""
+        objects = self.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist', pk_value=', '.join(map(str, missing))
+            )
+
+        return [objects[pk] for pk in pks]
+
+    def to_internal_value(self, data):
+        pk = self.to_pk(data)
+        if isinstance(self.parent.parent, BulkRelatedListSerializer):
+            return pk
+
+        return self.resolve([pk])[0]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """List of primary keys resolved by one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        return self.child_relation.resolve(
+            [self.child_relation.to_pk(item) for item in data]
+        )
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """
+    List serializer resolving each 'BulkPrimaryKeyRelatedField'
+    of the items by one query for all items.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        for field in self.child._writable_fields:
+            if not isinstance(field, BulkPrimaryKeyRelatedField):
+                continue
+            try:
+                objects = field.resolve(
+                    [item[field.source] for item in items]
+                )
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError(
+                    {field.field_name: error.detail}
+                )
+            for item, obj in zip(items, objects):
+                item[field.source] = obj
+
+        return items
+
+
+class LimitedBase64ImageField(Base64ImageField):
+    """
+    Base64 image with limited size and dimensions.
+
+    The size is checked before the payload is decoded
+    and the dimensions are read from the image header,
+    so oversized images are rejected without decoding their pixels.
+    """
+
+    default_error_messages = {
+        'max_bytes': 'The image must not be larger than {max_bytes} bytes.',
+        'max_pixels': 'The image must not exceed {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, base64_data):
+        if isinstance(base64_data, str):
+            payload = base64_data.rpartition(';base64,')[2]
+            # Every 4 base64 characters encode 3 bytes.
+            if len(payload) // 4 * 3 > settings.IMAGE_MAX_BYTES:
+                self.fail('max_bytes', max_bytes=settings.IMAGE_MAX_BYTES)
+        image = super().to_internal_value(base64_data)
+        if image is None:
+            return image
+        width, height = image.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('max_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+
+        return image
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized variants of the recipe image.
+
+    Empty until the variants of the current image are generated.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        variants = recipe.image_variants
+        if not recipe.image or variants.get('source') != recipe.image.name:
+            return {}
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in variants.items():
+            if variant == 'source':
+                continue
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+
+        return urls
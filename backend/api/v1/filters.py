@@ -3,12 +3,58 @@ Filters.
 """
 from django_filters.rest_framework import FilterSet, filters
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Q
 
-from recipes.models import Tag, Ingredient, Recipe
+from core.constants import ConstantRecipes
+from recipes.models import Tag, Ingredient, IngredientInRecipe, Recipe
 
 User = get_user_model()
 
 
+def search_similar(queryset, field_name, value):
+    """
+    Typo-tolerant search by trigram similarity ordered by relevance.
+
+    Databases without 'pg_trgm' fall back to a substring search.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(**{f'{field_name}__icontains': value})
+
+    return queryset.filter(
+        **{f'{field_name}__trigram_similar': value}
+    ).annotate(
+        similarity=TrigramSimilarity(field_name, value)
+    ).order_by('-similarity')
+
+
+def search_recipes(queryset, value):
+    """
+    Full-text search of recipes ordered by relevance.
+
+    Uses the 'search_vector' maintained by PostgreSQL triggers,
+    other databases fall back to a substring search.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(
+            Q(name__icontains=value)
+            | Q(text__icontains=value)
+            | Q(pk__in=IngredientInRecipe.objects.filter(
+                ingredient__name__icontains=value
+            ).values('recipe'))
+        )
+    query = SearchQuery(value, config='russian', search_type='websearch')
+
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank')
+
+
 class IngredientFilter(FilterSet):
     """Filter class for model 'Ingredient'."""
 
@@ -16,15 +62,32 @@ class IngredientFilter(FilterSet):
         field_name='name',
         lookup_expr='istartswith',
     )
+    fuzzy = filters.CharFilter(
+        method='get_fuzzy',
+    )
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'fuzzy')
+
+    def get_fuzzy(self, queryset, name, value):
+        """Searches ingredients by a similar name."""
+        return search_similar(queryset, 'name', value)
 
 
 class RecipeFilter(FilterSet):
     """Filter class for 'Recipe' model."""
 
+    name = filters.CharFilter(
+        field_name='name',
+        lookup_expr='istartswith',
+    )
+    fuzzy = filters.CharFilter(
+        method='get_fuzzy',
+    )
+    search = filters.CharFilter(
+        method='get_search',
+    )
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all()
     )
@@ -32,6 +95,7 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='get_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -43,22 +107,54 @@ class RecipeFilter(FilterSet):
     class Meta:
         model = Recipe
         fields = (
+            'name',
+            'fuzzy',
+            'search',
             'tags',
             'author',
             'is_favorited',
             'is_in_shopping_cart',
         )
 
+    def get_fuzzy(self, queryset, name, value):
+        """Searches recipes by a similar name."""
+        return search_similar(queryset, 'name', value)
+
+    def get_search(self, queryset, name, value):
+        """Searches recipes by name, description and ingredients."""
+        return search_recipes(queryset, value)
+
+    def get_tags(self, queryset, name, value):
+        """
+        Filters recipes having any of the tags by 'Recipe.tags_mask'
+        without joining the tags table.
+
+        No index can answer the bitwise test, so the recipes are still
+        scanned, in the list order by 'recipe_pub_date_id_idx' until
+        a page is filled, testing one bigint column per row.
+        """
+        if not value:
+            return queryset
+        tag_ids = [tag.id for tag in value]
+        if max(tag_ids) > ConstantRecipes.MAX_MASK_TAG_ID:
+            return queryset.filter(tags__in=tag_ids).distinct()
+
+        return queryset.alias(
+            selected_tags=F('tags_mask').bitand(
+                Recipe.get_tags_mask(tag_ids)
+            )
+        ).filter(selected_tags__gt=0)
+
     def get_is_favorited(self, queryset, name, value):
         """Filters recipes based on user favorites."""
         if self.request.user.is_authenticated and value is True:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
 
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         """Filters recipes based on users shopping cart."""
         if self.request.user.is_authenticated and value is True:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
 
         return queryset
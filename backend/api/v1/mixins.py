@@ -0,0 +1,86 @@
+"""
+Viewset mixins.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag, urlencode
+from rest_framework import status
+
+from core.cache import get_data_version, is_cache_shared
+
+
+class CachedResponseMixin:
+    """
+    Caches rendered JSON responses of the 'list' and 'retrieve' actions.
+
+    Responses are stored under the version of 'cache_namespace',
+    so bumping the version invalidates all of them at once.
+    Each response carries an ETag and 'If-None-Match' requests
+    with a matching tag get '304 Not Modified' without a body.
+    Responses are not cached if the default cache is local
+    to the process, as it misses the versions bumped by others.
+    """
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_response_cache_key(self, request):
+        """
+        Cache key of the response for the path and sorted query.
+
+        They are hashed to fit the key length and characters
+        allowed by memcached.
+        """
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(
+            f'{request.accepted_media_type}:{request.path}?{query}'.encode()
+        ).hexdigest()
+
+        return (
+            f'response:{self.cache_namespace}:'
+            f'{get_data_version(self.cache_namespace)}:{digest}'
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Returns the cached response or renders and caches a new one."""
+        if (
+            request.accepted_renderer.format != 'json'
+            or not is_cache_shared()
+        ):
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            cached = (
+                response.content,
+                response['Content-Type'],
+                quote_etag(hashlib.md5(response.content).hexdigest()),
+            )
+            cache.set(key, cached, settings.RESPONSE_CACHE_TIMEOUT)
+        content, content_type, etag = cached
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+
+        return response
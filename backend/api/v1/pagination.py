@@ -1,13 +1,166 @@
 """
 Pagination module.
 """
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework import pagination
+from rest_framework.response import Response
 
+from core.cache import COUNTS_NAMESPACE, get_data_version, is_cache_shared
 from core.constants import MAX_PAGE_SIZE
 
 
+class CountCachingPaginator(Paginator):
+    """
+    Paginator with a cheaper count of objects.
+
+    Unfiltered tables larger than 'APPROXIMATE_COUNT_THRESHOLD'
+    are counted by the PostgreSQL planner estimate. With a shared
+    cache the counts, exact or estimated, are cached per query
+    for 'COUNT_CACHE_TIMEOUT' seconds and invalidated by the writes
+    to the counted models.
+    Querysets are counted without their selected annotations.
+    """
+
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        key = self.get_count_cache_key()
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                count, self.count_is_exact = cached
+                return count
+        count = self.get_estimated_count()
+        if count is None or count < settings.APPROXIMATE_COUNT_THRESHOLD:
+            count = self.get_exact_count()
+        else:
+            self.count_is_exact = False
+        if key is not None:
+            cache.set(
+                key,
+                (count, self.count_is_exact),
+                settings.COUNT_CACHE_TIMEOUT,
+            )
+
+        return count
+
+    def get_count_queryset(self):
+        """
+        Queryset of the object list selecting only the primary keys.
+
+        Annotations used by the filters stay in the WHERE clause,
+        the others are not computed for every counted row.
+        """
+        if not isinstance(self.object_list, QuerySet):
+            return None
+
+        return self.object_list.values('pk').order_by()
+
+    def get_exact_count(self):
+        queryset = self.get_count_queryset()
+        if queryset is None:
+            return super().count
+
+        return queryset.count()
+
+    def get_count_cache_key(self):
+        """
+        Cache key of the count for the filters of the object list.
+
+        Selected annotations, e.g. flags of the current user,
+        are not part of the key, so equal filters share the count.
+        Without a shared cache the invalidations made by other
+        processes are not seen, so counts are not cached.
+        """
+        queryset = self.get_count_queryset()
+        if queryset is None or not is_cache_shared():
+            return None
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+
+        return f'count:{get_data_version(COUNTS_NAMESPACE)}:{digest}'
+
+    def get_estimated_count(self):
+        """Planner estimate of the number of rows of an unfiltered table."""
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+
+        return int(row[0])
+
+
+class CustomCursorPagination(pagination.CursorPagination):
+    """
+    A paginator that divides data into pages by an opaque cursor.
+
+    The ordering is taken from the 'cursor_ordering' attribute
+    of the view. It must end with a unique tiebreaker, e.g. 'id',
+    so the order is stable, and should be covered by an index,
+    e.g. 'recipe_pub_date_id_idx' for ('-pub_date', '-id').
+    """
+
+    page_size_query_param = 'limit'
+    page_size = MAX_PAGE_SIZE
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+
 class CustomPagination(pagination.PageNumberPagination):
-    """A paginator that divides data into pages."""
+    """
+    A paginator that divides data into pages.
+
+    Page numbers are used by default. Passing the 'cursor' query
+    parameter (empty for the first page) switches the request
+    to the keyset pagination of 'CustomCursorPagination'.
+    """
 
     page_size_query_param = 'limit'
     page_size = MAX_PAGE_SIZE
+    django_paginator_class = CountCachingPaginator
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        return Response(OrderedDict((
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        )))
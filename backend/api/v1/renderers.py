@@ -0,0 +1,29 @@
+"""
+Renderers of file downloads.
+
+Downloads are streamed by the views, the renderers only select
+the file format by the 'format' query parameter or 'Accept' header
+and render error responses.
+"""
+from rest_framework.renderers import BaseRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Plain text download."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """CSV download."""
+
+    media_type = 'text/csv'
+    format = 'csv'
@@ -5,18 +5,26 @@ import webcolors
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from django.db.models import Prefetch, prefetch_related_objects
 from django.db.transaction import atomic
 from drf_extra_fields.fields import Base64ImageField
 
 from core.constants import ConstantRecipes
-from users.models import Follow
+from core.sql import bulk_delete_returning
 from recipes.models import (
     Ingredient,
     Tag,
     Recipe,
     IngredientInRecipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem,
+)
+from .fields import (
+    BulkPrimaryKeyRelatedField,
+    BulkRelatedListSerializer,
+    ImageVariantsField,
+    LimitedBase64ImageField,
 )
 
 User = get_user_model()
@@ -56,19 +64,30 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        """Checking a user's subscription to other users."""
+        """
+        Checking a user's subscription to other users.
+
+        The ids of the followed authors are loaded once
+        and shared by all serializers with the same context.
+        """
         request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return False
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is None:
+            subscriptions = set(
+                request.user.follower.values_list('author_id', flat=True)
+            )
+            self.context['subscriptions'] = subscriptions
 
-        return (
-            request and request.user.is_authenticated
-            and request.user.follower.filter(author_id=obj.id).exists()
-        )
+        return obj.id in subscriptions
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Shortened recipe serializer."""
 
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -76,6 +95,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
@@ -83,9 +103,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
 class SubscriptionSerializer(CustomUserSerializer):
     """Serializer about user-created subscriptions and recipes."""
 
-    recipes_count = serializers.ReadOnlyField(
-        source='recipes.count'
-    )
+    recipes_count = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField(
         method_name='get_recipes'
     )
@@ -117,34 +135,6 @@ class SubscriptionSerializer(CustomUserSerializer):
         return ShortRecipeSerializer(recipes, many=True, read_only=True).data
 
 
-class FollowSerializer(serializers.ModelSerializer):
-    """Serializer for model Follow."""
-
-    class Meta:
-        model = Follow
-        fields = ('user', 'author')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('user', 'author'),
-                message='You are already subscribed.'
-            )
-        ]
-
-    def validate(self, data):
-        """Self-subscription check."""
-        if data['user'] == data['author']:
-            raise serializers.ValidationError('No self-subscription!')
-
-        return super().validate(data)
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-
-        return SubscriptionSerializer(instance.author, context=context).data
-
-
 class Hex2NameColor(serializers.Field):
     """Converts a color code to a color name."""
 
@@ -208,12 +198,34 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Serializer for model 'ShoppingListItem'."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.ReadOnlyField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+            'amount',
+        )
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
     """Serializer for the amount of ingredient in a recipe."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
-        error_messages={'does_not_exist': 'Ingredient not found!'},
+        error_messages={
+            'does_not_exist': 'Ingredients not found: {pk_value}!'
+        },
     )
     amount = serializers.IntegerField(
         min_value=ConstantRecipes.MIN_AMOUNT,
@@ -223,6 +235,7 @@ class AddIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = BulkRelatedListSerializer
 
 
 class RecipeReadSerializer(serializers.ModelSerializer):
@@ -241,6 +254,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         many=True,
     )
     image = Base64ImageField(required=True)
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField(
         read_only=True,
         method_name='get_is_favorited',
@@ -258,6 +272,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'tags',
             'author',
             'image',
+            'image_variants',
             'text',
             'ingredients',
             'cooking_time',
@@ -265,8 +280,15 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
         )
 
-    def in_list(self, obj, model):
-        """Checking whether the recipe is on the list."""
+    def in_list(self, obj, model, annotation):
+        """
+        Checking whether the recipe is on the list.
+
+        Reads the flag annotated by 'RecipeViewSet.get_queryset'
+        and queries the list only for not annotated recipes.
+        """
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         request = self.context.get('request')
 
         return (
@@ -278,23 +300,24 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """Checking whether the recipe is in your favorites."""
-        return self.in_list(obj, Favorite)
+        return self.in_list(obj, Favorite, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
         """Checking whether the recipe is in the shopping cart."""
-        return self.in_list(obj, ShoppingCart)
+        return self.in_list(obj, ShoppingCart, 'is_in_shopping_cart')
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for model 'Recipe' on POST, PATCH, requests."""
 
     author = CustomUserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
+        error_messages={'does_not_exist': 'Tags not found: {pk_value}!'},
     )
     ingredients = AddIngredientSerializer(many=True)
-    image = Base64ImageField(required=True)
+    image = LimitedBase64ImageField(required=True)
     cooking_time = serializers.IntegerField(
         min_value=ConstantRecipes.MIN_COOKING_TIME,
         max_value=ConstantRecipes.MAX_COOKING_TIME,
@@ -313,38 +336,46 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, data):
-        """Validate tags, ingredients, cooking time, recipe image"""
+        """
+        Validate tags, ingredients, cooking time, recipe image.
+
+        Partial updates check only the tags and ingredients they contain.
+        """
         # Checking tags.
-        tags = data.get('tags')
-        if not tags:
-            raise serializers.ValidationError(
-                'You must select at least one tag.'
-            )
-        if len(tags) != len(set(tags)):
-            raise serializers.ValidationError(
-                'Tags should not be repeated!'
-            )
+        if not self.partial or 'tags' in data:
+            tags = data.get('tags')
+            if not tags:
+                raise serializers.ValidationError(
+                    'You must select at least one tag.'
+                )
+            if len(tags) != len(set(tags)):
+                raise serializers.ValidationError(
+                    'Tags should not be repeated!'
+                )
 
         # Checking ingredients.
-        ingredients = data.get('ingredients')
-        if not ingredients:
-            raise serializers.ValidationError(
-                'The ingredients field cannot be empty.'
-            )
-        for ingredient in ingredients:
-            ingredient_name = ingredient['id']
-        if int(ingredient['amount']) <= ConstantRecipes.INCORRECT_AMOUNT:
-            raise serializers.ValidationError(
-                f'Incorrect quantity for {ingredient_name}'
-            )
-        if not isinstance(ingredient['amount'], int):
-            raise serializers.ValidationError(
-                'must be a whole number!'
-            )
-        if (len(set(item['id'] for item in ingredients)) != len(ingredients)):
-            raise serializers.ValidationError(
-                'There can be no duplicate ingredients!'
-            )
+        if not self.partial or 'ingredients' in data:
+            ingredients = data.get('ingredients')
+            if not ingredients:
+                raise serializers.ValidationError(
+                    'The ingredients field cannot be empty.'
+                )
+            for ingredient in ingredients:
+                ingredient_name = ingredient['id']
+            if int(ingredient['amount']) <= ConstantRecipes.INCORRECT_AMOUNT:
+                raise serializers.ValidationError(
+                    f'Incorrect quantity for {ingredient_name}'
+                )
+            if not isinstance(ingredient['amount'], int):
+                raise serializers.ValidationError(
+                    'must be a whole number!'
+                )
+            if len(set(item['id'] for item in ingredients)) != len(
+                ingredients
+            ):
+                raise serializers.ValidationError(
+                    'There can be no duplicate ingredients!'
+                )
 
         return super().validate(data)
 
@@ -380,19 +411,81 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @staticmethod
+    def update_ingredient_in_recipe_objects(ingredients, recipe):
+        """
+        Updates the ingredients of a recipe by their difference.
+
+        Only changed amounts are updated, removed rows are deleted
+        and new rows are inserted. Bulk statements send no signals,
+        so the shopping lists are recomputed for the affected ingredients.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.amount.all()
+        }
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        added = []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                added.append(IngredientInRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if removed:
+            bulk_delete_returning(
+                IngredientInRecipe, 'id', id=[item.pk for item in removed]
+            )
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+        affected = [item.ingredient_id for item in removed + changed + added]
+        if affected:
+            ShoppingListItem.refresh(
+                ShoppingCart.objects.filter(recipe=recipe).values('user'),
+                affected,
+            )
+
     @atomic
     def update(self, instance, validated_data):
-        """Updates recipe."""
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredient_in_recipe_objects(ingredients, instance)
+        """
+        Updates recipe.
+
+        Tags and ingredients are changed by their difference
+        and left untouched if a partial update omits them.
+        """
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredient_in_recipe_objects(ingredients, instance)
 
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,),
+            'tags',
+            Prefetch(
+                'amount',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
         serializer = RecipeReadSerializer(
             instance, context={'request': self.context.get('request')}
         )
@@ -400,57 +493,14 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Serializer for model 'Favorite'."""
+class RecipeIdsSerializer(serializers.Serializer):
+    """Serializer for the recipe ids of bulk requests."""
 
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all()
-    )
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=ConstantRecipes.MAX_BULK_RECIPES,
     )
 
-    class Meta:
-        model = Favorite
-        fields = ('recipe', 'user')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('recipe', 'user'),
-                message='The recipe has already been added to your list.'
-            )
-        ]
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-
-        return ShortRecipeSerializer(instance.recipe, context=context).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Serializer for model 'ShoppingCar'."""
-
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all()
-    )
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
-    )
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('recipe', 'user')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('recipe', 'user'),
-                message='The recipe has already been added to your list.'
-            )
-        ]
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-
-        return ShortRecipeSerializer(instance.recipe, context=context).data
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
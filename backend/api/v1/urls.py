@@ -9,6 +9,7 @@ from .views import (
     IngredientViewSet,
     RecipeViewSet,
     TagViewSet,
+    TokenCacheStatsView,
 )
 
 
@@ -23,5 +24,6 @@ router_v1.register('users', CustomUserViewSet, basename='users')
 urlpatterns = [
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
+    path('auth/token/cache/', TokenCacheStatsView.as_view()),
     path('auth/', include('djoser.urls.authtoken')),
 ]
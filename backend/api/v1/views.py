@@ -1,20 +1,30 @@
 """
 Module for creating, configuring and managing `api' app viewsets
 """
-from datetime import datetime
-
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+)
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 from djoser.views import UserViewSet
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.views import APIView
 
 from recipes.models import (
     Ingredient,
@@ -22,22 +32,29 @@ from recipes.models import (
     Recipe,
     Favorite,
     ShoppingCart,
+    ShoppingListItem,
     IngredientInRecipe
 )
+from core.cache import INGREDIENTS_NAMESPACE, TAGS_NAMESPACE
+from recipes.search import ingredient_index
+from users.authentication import token_cache
 from users.models import Follow
+from .exports import EXPORTS, gzip_stream
+from .mixins import CachedResponseMixin
 from .pagination import CustomPagination
 from .permissions import IsAuthorOrReadOnly, IsAdminUserOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
 from .filters import IngredientFilter, RecipeFilter
 from .serializers import (
-    FavoriteSerializer,
-    FollowSerializer,
-    ShoppingCartSerializer,
     IngredientSerializer,
     TagSerializer,
     RecipeReadSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
+    ShortRecipeSerializer,
     CustomUserSerializer,
     SubscriptionSerializer,
+    ShoppingListItemSerializer,
 )
 
 User = get_user_model()
@@ -49,6 +66,7 @@ class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
     permission_classes = (IsAdminUserOrReadOnly,)
 
     @action(
@@ -57,8 +75,13 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
+        recipes = self.get_subscription_recipes(
+            request.user, request.query_params.get('recipes_limit')
+        )
         subscribed_to = self.paginate_queryset(
-            User.objects.filter(following__user=request.user)
+            User.objects.filter(following__user=request.user).prefetch_related(
+                Prefetch('recipes', queryset=recipes)
+            )
         )
         serializer = SubscriptionSerializer(
             subscribed_to,
@@ -67,27 +90,62 @@ class CustomUserViewSet(UserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def get_subscription_recipes(user, limit):
+        """
+        Recipes of the authors the user is subscribed to.
+
+        With 'recipes_limit' only the first recipes of each author
+        are selected by one query using ROW_NUMBER() OVER (PARTITION BY).
+        """
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return Recipe.objects.all()
+        if limit < 0:
+            return Recipe.objects.all()
+        ranked = Recipe.objects.filter(
+            author__following__user=user
+        ).annotate(
+            recipe_position=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=[F(field).asc() for field in Recipe._meta.ordering],
+            )
+        ).order_by().values('pk', 'recipe_position')
+        sql, params = ranked.query.sql_with_params()
+
+        return Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) AS ranked '
+            f'WHERE ranked.recipe_position <= %s',
+            (*params, limit),
+        ))
+
     @action(
         detail=True,
         methods=['post', 'delete'],
         permission_classes=[IsAuthenticated],
     )
     def subscribe(self, request, id):
-        author = get_object_or_404(User, pk=id)
-        subscription = Follow.objects.filter(user=request.user, author=author)
-        if request.method == 'POST':
-            serializer = FollowSerializer(
-                data={'user': request.user.id, 'author': author.id},
-                context={'request': request},
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if not subscription.exists():
+        """
+        Depending on the method, subscribes to the author
+        or unsubscribes from him by one idempotent statement.
+        """
+        if request.method == 'DELETE':
+            if id.isdigit() and Follow.remove(request.user, int(id)):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, pk=id)
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
+        author = get_object_or_404(User, pk=id)
+        if author == request.user:
+            raise ValidationError('No self-subscription!')
+        if not Follow.add(request.user, author.pk):
+            raise ValidationError('You are already subscribed.')
+        serializer = SubscriptionSerializer(
+            author, context={'request': request}
+        )
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         detail=False,
@@ -102,18 +160,31 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
     """Viewset for 'ingredients' model."""
 
+    cache_namespace = INGREDIENTS_NAMESPACE
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        """
+        Searches ingredients by name in the in-memory index,
+        fuzzy and other requests are served from the database.
+        """
+        name = request.query_params.get('name')
+        if name and 'fuzzy' not in request.query_params:
+            return Response(ingredient_index.search(name))
+
+        return super().list(request, *args, **kwargs)
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
     """Viewset for 'tags' model."""
 
+    cache_namespace = TAGS_NAMESPACE
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
@@ -122,9 +193,15 @@ class RecipeViewSet(ModelViewSet):
     """Viewset for 'Recipes' model."""
 
     queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags', 'ingredients')
+        'tags',
+        Prefetch(
+            'amount',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        ),
+    ).defer('search_vector')
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPagination
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
@@ -135,33 +212,114 @@ class RecipeViewSet(ModelViewSet):
 
         return RecipeCreateUpdateSerializer
 
+    def get_queryset(self):
+        """
+        Annotates recipes with the 'is_favorited'
+        and 'is_in_shopping_cart' flags of the current user.
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Renders the errors of the shopping list download as JSON,
+        the file renderers are meant for the list only.
+        """
+        if (
+            self.action == 'download_shopping_cart'
+            and isinstance(response, Response)
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
     @staticmethod
-    def add_recipe(serializer_class, id, request):
-        """Adds recipes to the list."""
-        serializer = serializer_class(
-            data={'user': request.user.id, 'recipe': id},
-            context={'request': request},
+    def add_recipe(model, id, request):
+        """
+        Adds recipes to the list.
+
+        The recipe is loaded once for the check and the response,
+        the row is inserted by one idempotent INSERT.
+        """
+        recipe = Recipe.objects.filter(pk=id).only(
+            'name', 'image', 'image_variants', 'cooking_time'
+        ).first() if id.isdigit() else None
+        if recipe is None:
+            raise ValidationError({'recipe': 'The recipe does not exist.'})
+        if not model.add(request.user, recipe.pk):
+            raise ValidationError(
+                'The recipe has already been added to your list.'
+            )
+        serializer = ShortRecipeSerializer(
+            recipe, context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
     def delete_recipe(model, id, request):
-        """Removes recipes from the list."""
-        recipe = get_object_or_404(Recipe, pk=id)
-        recipe_in_list = model.objects.filter(
-            recipe=recipe, user=request.user,
-        )
-        if recipe_in_list.exists():
-            recipe_in_list.delete()
+        """Removes recipes from the list by one DELETE."""
+        if id.isdigit() and model.remove(request.user, int(id)):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=id)
         return Response({
             'recipe': 'You are trying to delete a recipe that does not exist.'
         },
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    @staticmethod
+    def bulk_change_recipes(model, request):
+        """
+        Adds or removes a list of recipes depending on the method.
+
+        The recipes are checked by one query, the changes are made
+        by one INSERT or DELETE and the result is returned per id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        in_list = dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+            in_list=Exists(model.objects.filter(
+                user=request.user, recipe=OuterRef('pk')
+            ))
+        ).values_list('pk', 'in_list'))
+        if request.method == 'POST':
+            changed = set(model.bulk_add(request.user, [
+                pk for pk in recipe_ids if in_list.get(pk) is False
+            ]))
+            statuses = ('added', 'already_added')
+        else:
+            changed = set(model.bulk_remove(request.user, [
+                pk for pk in recipe_ids if in_list.get(pk)
+            ]))
+            statuses = ('removed', 'not_in_list')
+        results = [
+            {
+                'id': pk,
+                'status': 'not_found' if pk not in in_list
+                else statuses[0] if pk in changed
+                else statuses[1],
+            }
+            for pk in recipe_ids
+        ]
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -173,7 +331,7 @@ class RecipeViewSet(ModelViewSet):
         adds or removes a recipe from favorites.
         """
         if request.method == 'POST':
-            return self.add_recipe(FavoriteSerializer, pk, request)
+            return self.add_recipe(Favorite, pk, request)
         return self.delete_recipe(Favorite, pk, request)
 
     @action(
@@ -187,40 +345,86 @@ class RecipeViewSet(ModelViewSet):
         adds or removes a recipe from the shopping list.
         """
         if request.method == 'POST':
-            return self.add_recipe(ShoppingCartSerializer, pk, request)
+            return self.add_recipe(ShoppingCart, pk, request)
         return self.delete_recipe(ShoppingCart, pk, request)
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        """Adds or removes a list of recipes from favorites."""
+        return self.bulk_change_recipes(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        """Adds or removes a list of recipes from the shopping list."""
+        return self.bulk_change_recipes(ShoppingCart, request)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_summary(self, request):
+        """Total amounts of ingredients in the shopping cart."""
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        serializer = ShoppingListItemSerializer(items, many=True)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(
         detail=False,
         methods=('get',),
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        """Downloads a shopping list."""
+        """
+        Downloads a shopping list.
+
+        The file format is selected by '?format=txt|csv|json',
+        '?gzip=true' compresses the file.
+        """
         if not self.request.user.shopping_cart.exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=self.request.user
+            return Response(
+                {'shopping_cart': 'Your shopping cart is empty.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ingredients = ShoppingListItem.objects.filter(
+            user=self.request.user
         ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(amount=Sum('amount'))
-        today = datetime.today()
-        shopping_list = (
-            f'FoodGram Service\n'
-            f"Today date.: {today:%Y-%m-%d}\n"
-            f'Your shopping list.:\n'
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount=F('total_amount'),
+        ).order_by('name')
+        renderer = request.accepted_renderer
+        content = EXPORTS[renderer.format](ingredients.iterator())
+        filename = f'shopping_list.{renderer.format}'
+        content_type = f'{renderer.media_type}; charset=utf-8'
+        if request.query_params.get('gzip') in ('true', '1'):
+            content = gzip_stream(content)
+            filename += '.gz'
+            content_type = 'application/gzip'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.request.user.username}_{filename}"'
         )
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredient__name"]} - {ingredient["amount"]} '
-            f'{ingredient["ingredient__measurement_unit"]}'
-            for ingredient in ingredients
-        ])
-        filename = f'{self.request.user}_shopping_list.txt'
-        content_type = 'text/plain,charset=utf8'
-        response = HttpResponse(shopping_list, content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+
+class TokenCacheStatsView(APIView):
+    """Hit and miss counters of the token cache of this process."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(token_cache.get_stats(), status=status.HTTP_200_OK)
@@ -0,0 +1,46 @@
+"""
+Admin list filters.
+"""
+from django.contrib import admin
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter with a text input instead of a list of choices.
+
+    Unlike the related field filters it never loads the rows
+    of the related table, so it stays usable on large tables.
+    Objects are filtered by the prefix of the 'parameter_name' lookup.
+    """
+
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # A non-empty value is required to display the filter.
+        return ((),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.parameter_name}__istartswith': self.value()}
+            )
+
+        return queryset
+
+
+def input_filter(lookup, title):
+    """Creates an 'InputFilter' by the text field 'lookup'."""
+    return type(
+        f'{lookup.title().replace("_", "")}InputFilter',
+        (InputFilter,),
+        {'parameter_name': lookup, 'title': title},
+    )
@@ -0,0 +1,70 @@
+"""
+Versioned cache.
+
+Cached data is stored under keys containing the version of its namespace.
+Bumping the version on writes makes all old entries unreachable,
+so they are never invalidated one by one and simply expire.
+Versions are seen by other processes, e.g. management commands,
+only if the default cache is shared by them.
+"""
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Exact counts of paginated list responses.
+COUNTS_NAMESPACE = 'counts'
+# Tags and ingredients reference data.
+TAGS_NAMESPACE = 'tags'
+INGREDIENTS_NAMESPACE = 'ingredients'
+# Prefix of the namespaces of the cached tokens and their users.
+TOKENS_NAMESPACE = 'tokens'
+
+
+def get_data_version_key(namespace):
+    return f'data_version:{namespace}'
+
+
+def get_data_version(namespace, create=True):
+    """
+    Returns the current version of the namespace data.
+
+    Without 'create' a namespace with no version yet gives None.
+    """
+    key = get_data_version_key(namespace)
+    version = cache.get(key)
+    if version is None and create:
+        # A time based start value does not collide with the versions
+        # of entries left in a shared cache by an evicted version key.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_data_version(*namespaces):
+    """Invalidates all cached data of the namespaces."""
+    for namespace in namespaces:
+        key = get_data_version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def delete_data_version(*namespaces):
+    """
+    Invalidates all cached data of the namespaces and forgets them,
+    their next versions start anew.
+    """
+    cache.delete_many([
+        get_data_version_key(namespace) for namespace in namespaces
+    ])
+
+
+def is_cache_shared():
+    """Whether the default cache is shared by all processes."""
+    return not isinstance(
+        caches[DEFAULT_CACHE_ALIAS], (DummyCache, LocMemCache)
+    )
@@ -60,6 +60,10 @@ class ConstantRecipes():
     # Recipe model.
     MIN_COOKING_TIME = 1
     MAX_COOKING_TIME = 9000
+    # Tags with ids up to this one fit into the signed 64 bit tags mask.
+    MAX_MASK_TAG_ID = 63
+    # Recipes added or removed by one bulk request.
+    MAX_BULK_RECIPES = 100
     # IngredientInRecipe model.
     MIN_AMOUNT = 1
     MAX_AMOUNT = 9000
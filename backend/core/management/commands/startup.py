@@ -0,0 +1,148 @@
+"""
+Custom django-admin command to prepare the application for start.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from core.models import Fingerprint
+from recipes.management.commands import (
+    import_ingredients_data,
+    import_tags_data,
+)
+
+CHUNK_SIZE = 64 * 1024
+# Data import commands and the files they read.
+DATA_STEPS = {
+    'import_ingredients_data': import_ingredients_data.DEFAULT_FILE_PATHS,
+    'import_tags_data': import_tags_data.DEFAULT_FILE_PATHS,
+}
+# Fingerprint of the collected static files, kept in STATIC_ROOT.
+STATIC_FINGERPRINT_FILE = '.collectstatic_fingerprint'
+# Files skipped by collectstatic.
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+def hash_file(path):
+    """SHA-256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def hash_static_files():
+    """SHA-256 of the names, sizes and times of the static source files."""
+    files = []
+    for finder in get_finders():
+        for path, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            stat = os.stat(storage.path(path))
+            files.append(f'{path}:{stat.st_size}:{stat.st_mtime_ns}')
+    digest = hashlib.sha256()
+    for line in sorted(files):
+        digest.update(line.encode())
+
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    """
+    Command to migrate, import data and collect static files on start,
+    skipping the steps whose input did not change since the last run:
+    python manage.py startup
+    command in docker container:
+    docker compose exec backend python manage.py startup
+
+    Static files are collected while the database is prepared,
+    the data files are imported concurrently after the migrations.
+    """
+
+    help = 'Preparing the application for start.'
+
+    def handle(self, **kwargs):
+        starting_message = '***Starting preparing the application!!!***'
+        self.stdout.write(self.style.WARNING(f'{starting_message}'))
+        self.verbosity = kwargs['verbosity']
+        self.report = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=1 + len(DATA_STEPS)) as pool:
+            steps = [pool.submit(
+                self.run_step, 'collectstatic', self.collect_static
+            )]
+            self.run_step('migrate', self.migrate)
+            steps.extend(
+                pool.submit(self.run_step, step, self.import_data, step)
+                for step in DATA_STEPS
+            )
+            for step in steps:
+                step.result()
+        for step, status, duration in self.report:
+            self.stdout.write(f'{step:<26}{status:<10}{duration:8.2f} s')
+        self.stdout.write(self.style.SUCCESS(
+            f'***Application prepared in '
+            f'{time.monotonic() - started:.2f} s!***'
+        ))
+
+    def run_step(self, step, function, *args):
+        """Runs the step and adds its status and duration to the report."""
+        started = time.monotonic()
+        try:
+            status = function(*args)
+        finally:
+            # Connections of the pool threads are never closed otherwise.
+            connections.close_all()
+        self.report.append((step, status, time.monotonic() - started))
+
+    def migrate(self):
+        """Applies the migrations if any are not applied."""
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        if not executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            return 'skipped'
+        call_command('migrate', interactive=False, verbosity=self.verbosity)
+
+        return 'done'
+
+    def import_data(self, step):
+        """Imports the data file if it changed since the last import."""
+        path = next(
+            (path for path in DATA_STEPS[step] if os.path.exists(path)), None
+        )
+        if path is None:
+            return 'missing'
+        value = hash_file(path)
+        if Fingerprint.objects.filter(step=step, value=value).exists():
+            return 'skipped'
+        call_command(step, file=path, verbosity=self.verbosity)
+        Fingerprint.objects.update_or_create(
+            step=step, defaults={'value': value}
+        )
+
+        return 'done'
+
+    def collect_static(self):
+        """Collects the static files if any source file changed."""
+        value = hash_static_files()
+        fingerprint_path = os.path.join(
+            settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE
+        )
+        if os.path.exists(fingerprint_path):
+            with open(fingerprint_path, encoding='utf-8') as file:
+                if file.read() == value:
+                    return 'skipped'
+        call_command(
+            'collectstatic', interactive=False, verbosity=self.verbosity
+        )
+        with open(fingerprint_path, 'w', encoding='utf-8') as file:
+            file.write(value)
+
+        return 'done'
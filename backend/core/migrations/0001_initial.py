@@ -0,0 +1,27 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.CharField(max_length=64, unique=True, verbose_name='Startup step')),
+                ('value', models.CharField(max_length=64, verbose_name='Hash of the step input')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Last run')),
+            ],
+            options={
+                'verbose_name': 'Fingerprint',
+                'verbose_name_plural': 'Fingerprints',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+"""
+Model mixins.
+"""
+
+
+class CountersMixin:
+    """
+    Protects denormalized counters from lost updates.
+
+    Counters listed in 'counter_fields' are changed only by F()
+    expressions, so saving a loaded instance never writes them back.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped_fields = (
+                set(self.counter_fields) | self.get_deferred_fields()
+            )
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped_fields
+            ]
+        super().save(*args, **kwargs)
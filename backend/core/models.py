@@ -1,9 +1,17 @@
 """
 Abstract models.
 """
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from core.cache import COUNTS_NAMESPACE, bump_data_version
+from core.sql import (
+    bulk_delete_returning,
+    bulk_insert_ignore,
+    delete_returning,
+    insert_ignore,
+)
+
 User = get_user_model()
 
 
@@ -21,6 +29,115 @@ class UserRecipe(models.Model):
         verbose_name='Recipe',
     )
 
+    # 'Recipe' field counting the rows of the model.
+    counter_field = None
+
     class Meta:
         abstract = True
         ordering = ('recipe',)
+
+    @classmethod
+    def change_counters(cls, recipe_ids, delta):
+        """Changes the counter of the recipes by 'delta'."""
+        recipe_model = cls._meta.get_field('recipe').related_model
+        recipe_model.objects.filter(pk__in=recipe_ids).update(
+            **{cls.counter_field: models.F(cls.counter_field) + delta}
+        )
+
+    @classmethod
+    def add(cls, user, recipe_id):
+        """
+        Adds the recipe to the user's list by one idempotent INSERT.
+
+        Returns False if the recipe is already in the list.
+        """
+        with transaction.atomic():
+            added = insert_ignore(cls, user=user.pk, recipe=recipe_id)
+            if added:
+                cls.bulk_changed(user, (recipe_id,), 1)
+
+        return added
+
+    @classmethod
+    def remove(cls, user, recipe_id):
+        """
+        Removes the recipe from the user's list by one DELETE.
+
+        Returns False if the recipe was not in the list.
+        """
+        with transaction.atomic():
+            removed = delete_returning(cls, user=user.pk, recipe=recipe_id)
+            if removed:
+                cls.bulk_changed(user, (recipe_id,), -1)
+
+        return removed
+
+    @classmethod
+    def bulk_add(cls, user, recipe_ids):
+        """
+        Adds the recipes to the user's list by one INSERT.
+
+        Returns the ids of the recipes actually added, the recipes
+        already in the list are skipped. No signals are sent,
+        so the denormalized data is updated by 'bulk_changed'.
+        """
+        with transaction.atomic():
+            added = bulk_insert_ignore(
+                cls,
+                (
+                    {'user': user.pk, 'recipe': recipe_id}
+                    for recipe_id in recipe_ids
+                ),
+                'recipe',
+            )
+            if added:
+                cls.bulk_changed(user, added, 1)
+
+        return added
+
+    @classmethod
+    def bulk_remove(cls, user, recipe_ids):
+        """
+        Removes the recipes from the user's list by one DELETE.
+
+        Returns the ids of the recipes actually removed.
+        """
+        with transaction.atomic():
+            removed = bulk_delete_returning(
+                cls, 'recipe', user=user.pk, recipe=list(recipe_ids)
+            )
+            if removed:
+                cls.bulk_changed(user, removed, -1)
+
+        return removed
+
+    @classmethod
+    def bulk_changed(cls, user, recipe_ids, delta):
+        """Updates the counters and caches after a bulk change."""
+        cls.change_counters(recipe_ids, delta)
+        bump_data_version(COUNTS_NAMESPACE)
+
+
+class Fingerprint(models.Model):
+    """Fingerprint of the input of a startup step."""
+
+    step = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Startup step',
+    )
+    value = models.CharField(
+        max_length=64,
+        verbose_name='Hash of the step input',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Last run',
+    )
+
+    class Meta:
+        verbose_name = 'Fingerprint'
+        verbose_name_plural = 'Fingerprints'
+
+    def __str__(self):
+        return f'{self.step}: {self.value}'
@@ -0,0 +1,109 @@
+"""
+Single statement writes and advisory locks.
+
+The statements send no model signals,
+the callers update the denormalized data themselves.
+Both are supported by PostgreSQL and SQLite 3.35+.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+
+def get_columns(model, fields, connection):
+    """Quoted columns of the model fields."""
+    return [
+        connection.ops.quote_name(model._meta.get_field(field).column)
+        for field in fields
+    ]
+
+
+def insert_ignore(model, **values):
+    """
+    Inserts a row by one INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns True if the row was inserted
+    and False if a conflicting row already exists.
+    """
+    return bool(bulk_insert_ignore(model, (values,), model._meta.pk.name))
+
+
+def bulk_insert_ignore(model, rows, returning):
+    """
+    Inserts the rows by one INSERT ... ON CONFLICT DO NOTHING.
+
+    'rows' are dicts with the same fields. Returns the values
+    of the 'returning' field of the rows actually inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    columns = get_columns(model, rows[0], connection)
+    placeholders = f'({", ".join(["%s"] * len(columns))})'
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} '
+        f'({", ".join(columns)}) '
+        f'VALUES {", ".join([placeholders] * len(rows))} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {get_columns(model, (returning,), connection)[0]}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row.values()])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_returning(model, **filters):
+    """
+    Deletes the rows matching the filters by one DELETE ... RETURNING.
+
+    Returns True if any row was deleted.
+    """
+    return bool(bulk_delete_returning(model, model._meta.pk.name, **filters))
+
+
+def bulk_delete_returning(model, returning, **filters):
+    """
+    Deletes the rows matching the filters by one DELETE ... RETURNING.
+
+    Lists and tuples in 'filters' match any of their values.
+    Returns the values of the 'returning' field of the deleted rows.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    conditions = []
+    params = []
+    for column, value in zip(
+        get_columns(model, filters, connection), filters.values()
+    ):
+        if isinstance(value, (list, tuple)):
+            if not value:
+                return []
+            conditions.append(
+                f'{column} IN ({", ".join(["%s"] * len(value))})'
+            )
+            params.extend(value)
+        else:
+            conditions.append(f'{column} = %s')
+            params.append(value)
+    sql = (
+        f'DELETE FROM {quote_name(model._meta.db_table)} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'RETURNING {get_columns(model, (returning,), connection)[0]}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def advisory_lock(key, using=DEFAULT_DB_ALIAS):
+    """
+    Takes an advisory lock on the string key until the transaction ends.
+
+    Must be called in an atomic block. Only PostgreSQL has advisory
+    locks, other databases are not locked.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [key])
@@ -0,0 +1,84 @@
+"""
+Content-addressed file storage.
+
+Files are named by the SHA-256 hash of their content, so identical
+uploads are stored once and a name always refers to the same bytes,
+which lets the web server cache media files forever.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from core.sql import advisory_lock
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_media_lock_key(name):
+    """Key of the advisory lock of the stored file name."""
+    return f'media:{name}'
+
+
+class ContentAddressedStorageMixin:
+    """
+    Names saved files by the hash of their content.
+
+    Mixed into any storage backend implementing 'exists' and '_save',
+    e.g. a local directory or an object store.
+    The directory of the requested name and its extension are kept:
+    'recipes/photo.jpg' is saved as 'recipes/ab/ab12...ef.jpg'.
+    Saving takes the lock of the name, which garbage collection
+    takes before checking the references to the file.
+    """
+
+    @staticmethod
+    def get_content_hash(content):
+        content_hash = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            content_hash.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        return content_hash.hexdigest()
+
+    def get_content_name(self, name, content):
+        """Name of the file derived from its content."""
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        content_hash = self.get_content_hash(content)
+
+        return os.path.join(
+            directory, content_hash[:2], f'{content_hash}{extension}'
+        ).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        self.lock(name)
+        # The same content is already stored under this name.
+        if self.exists(name):
+            return name
+
+        return super().save(name, content, max_length=max_length)
+
+    def lock(self, name):
+        """
+        Locks the name against deletion until the transaction ends.
+
+        An existing file may be reused by the saved object,
+        so it must not be deleted before the object is committed.
+        """
+        advisory_lock(get_media_lock_key(name))
+
+
+class ContentAddressedFileSystemStorage(
+    ContentAddressedStorageMixin, FileSystemStorage
+):
+    """Content-addressed storage in a local directory."""
@@ -0,0 +1,70 @@
+"""
+Tests of the `core' app.
+"""
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core.management.commands import startup
+from core.models import Fingerprint
+from recipes.models import Ingredient
+
+
+class StartupCommandTest(TestCase):
+    """Startup steps are skipped while their input does not change."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.command = startup.Command()
+        self.command.verbosity = 0
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+        return path
+
+    def test_migrate(self):
+        self.assertEqual(self.command.migrate(), 'skipped')
+
+    def test_import_data(self):
+        step = 'import_ingredients_data'
+        path = os.path.join(self.directory, 'ingredients.csv')
+        with mock.patch.dict(startup.DATA_STEPS, {step: (path,)}):
+            self.assertEqual(self.command.import_data(step), 'missing')
+            self.write_file('ingredients.csv', 'Мука,г\n')
+            self.assertEqual(self.command.import_data(step), 'done')
+            self.assertEqual(self.command.import_data(step), 'skipped')
+            self.write_file('ingredients.csv', 'Мука,г\nСоль,г\n')
+            self.assertEqual(self.command.import_data(step), 'done')
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(
+            Fingerprint.objects.get(step=step).value,
+            startup.hash_file(path),
+        )
+
+    def test_collect_static(self):
+        source = os.path.join(self.directory, 'source')
+        os.mkdir(source)
+        path = self.write_file('source/style.css', 'body {}')
+        with override_settings(
+            STATIC_ROOT=os.path.join(self.directory, 'static'),
+            STATICFILES_DIRS=[source],
+        ):
+            self.assertEqual(self.command.collect_static(), 'done')
+            self.assertTrue(os.path.exists(
+                os.path.join(self.directory, 'static', 'style.css')
+            ))
+            with mock.patch.object(startup, 'call_command') as call_command:
+                self.assertEqual(self.command.collect_static(), 'skipped')
+                call_command.assert_not_called()
+                self.write_file('source/style.css', 'body { margin: 0 }')
+                self.assertEqual(self.command.collect_static(), 'done')
+                call_command.assert_called_once()
+            os.remove(path)
+            self.assertEqual(self.command.collect_static(), 'done')
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     # THIRD_PARTY_APPS
     "rest_framework",
@@ -119,10 +120,44 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ],
 }
 
+# Cache shared by all processes, e.g. memcached at 'cache:11211'.
+# Without it every process has its own local memory cache.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
+if CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": CACHE_LOCATION,
+        }
+    }
+
+# Cached and approximate counts of paginated responses.
+COUNT_CACHE_TIMEOUT = int(os.getenv('COUNT_CACHE_TIMEOUT', 60))
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv('APPROXIMATE_COUNT_THRESHOLD', 100000)
+)
+
+# Cached responses of the tags and ingredients endpoints.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 86400))
+
+# Limits of uploaded recipe images and their resized variants.
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_VARIANTS = {
+    'list': (480, 480),
+    'detail': (1200, 1200),
+}
+
+# Cached token authentication.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'False') == 'True'
+
 INTERNAL_IPS = [
     "127.0.0.1",
     "localhost",
@@ -156,5 +191,7 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static/')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+# Media files are named by their content and never change.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedFileSystemStorage'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 from rest_framework.authtoken.models import TokenProxy
 
+from core.admin_filters import input_filter
 from .models import (
     Tag,
     Ingredient,
@@ -33,6 +34,9 @@ class IngredientsInRecipeInline(admin.StackedInline):
     """
 
     model = IngredientInRecipe
+    autocomplete_fields = (
+        'ingredient',
+    )
     min_num = 1
     extra = 1
 
@@ -48,17 +52,27 @@ class IngredientInRecipeAdmin(admin.ModelAdmin):
         'amount',
     )
     list_filter = (
-        'ingredient',
-        'recipe',
+        input_filter('ingredient__name', 'ingredient'),
+        input_filter('recipe__name', 'recipe'),
     )
     search_fields = (
-        'recipe',
+        '^recipe__name',
+        '^ingredient__name',
+    )
+    autocomplete_fields = (
         'ingredient',
+        'recipe',
     )
+    show_full_result_count = False
     ordering = (
         'id',
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe__author'
+        )
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -97,11 +111,12 @@ class IngredientAdmin(admin.ModelAdmin):
         'measurement_unit',
     )
     search_fields = (
-        'name',
+        '^name',
     )
     list_filter = (
-        'name',
+        'measurement_unit',
     )
+    show_full_result_count = False
 
 
 @admin.register(Recipe)
@@ -118,27 +133,32 @@ class RecipeAdmin(admin.ModelAdmin):
         'get_favorites',
     )
     search_fields = (
-        'name',
-        'author',
-        'tags',
+        '^name',
+        '^author__username',
     )
     list_filter = (
-        'name',
-        'author',
         'tags',
+        input_filter('author__username', 'author'),
+    )
+    autocomplete_fields = (
+        'author',
     )
+    show_full_result_count = False
     filter_horizontal = (
         'tags',
         'ingredients',
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author')
+
     @admin.display()
     def get_favorites(self, instance):
         """
         Shows the total number of times
         this recipe has been added to favorites.
         """
-        return instance.favorites.count()
+        return instance.favorites_count
 
 
 @admin.register(Favorite)
@@ -151,16 +171,27 @@ class FavoriteAdmin(admin.ModelAdmin):
         'recipe',
     )
     list_filter = (
-        'user',
-        'recipe',
+        input_filter('user__username', 'user'),
+        input_filter('recipe__name', 'recipe'),
     )
     search_fields = (
+        '^user__username',
+        '^recipe__name',
+    )
+    autocomplete_fields = (
         'user',
+        'recipe',
     )
+    show_full_result_count = False
     ordering = (
         'id',
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'recipe__author'
+        )
+
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
@@ -172,12 +203,23 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         'recipe',
     )
     list_filter = (
-        'user',
-        'recipe',
+        input_filter('user__username', 'user'),
+        input_filter('recipe__name', 'recipe'),
     )
     search_fields = (
+        '^user__username',
+        '^recipe__name',
+    )
+    autocomplete_fields = (
         'user',
+        'recipe',
     )
+    show_full_result_count = False
     ordering = (
         'id',
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'recipe__author'
+        )
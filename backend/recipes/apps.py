@@ -10,3 +10,6 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Recipe catalogue.'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,165 @@
+"""
+Resized variants of recipe images.
+
+The variants are generated by a thread pool after the transaction
+saving the recipe commits, so requests never wait for them.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from core.sql import advisory_lock
+from core.storage import get_media_lock_key
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants/'
+# Variant name suffix: (Pillow format, file extension).
+FORMATS = {
+    '': ('JPEG', 'jpg'),
+    '_webp': ('WEBP', 'webp'),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def to_rgb(image):
+    """Flattens transparent images onto a white background."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+
+    return image.convert('RGB')
+
+
+def make_variants(image_name):
+    """
+    Saves the resized variants of the image.
+
+    Returns the storage names of the variants
+    and of the source image under the 'source' key.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = {'source': image_name}
+    with default_storage.open(image_name) as file, Image.open(file) as image:
+        # JPEG images are decoded at the smallest sufficient scale.
+        image.draft('RGB', max(settings.IMAGE_VARIANTS.values()))
+        image = to_rgb(ImageOps.exif_transpose(image))
+        for variant, size in settings.IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.Resampling.LANCZOS)
+            for suffix, (image_format, extension) in FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, quality=85)
+                variants[variant + suffix] = default_storage.save(
+                    f'{VARIANTS_DIR}{stem}_{variant}.{extension}',
+                    ContentFile(buffer.getvalue()),
+                )
+
+    return variants
+
+
+def is_generated(variants, image_name):
+    """Whether the variants of the image were generated successfully."""
+    return variants.get('source') == image_name and len(variants) > 1
+
+
+def get_variants(image_name):
+    """
+    Variants of the image.
+
+    Identical uploads share one stored image,
+    so the variants made for another recipe are reused.
+    """
+    variants = Recipe.objects.filter(
+        image=image_name,
+        image_variants__source=image_name,
+        image_variants__has_key=next(iter(settings.IMAGE_VARIANTS)),
+    ).values_list('image_variants', flat=True).first()
+
+    return variants or make_variants(image_name)
+
+
+def generate_variants(recipe_id, image_name):
+    """
+    Generates the variants of the recipe image.
+
+    They are not stored if the image was replaced meanwhile.
+    A failure is stored as the source without variants,
+    so later saves of the recipe do not retry it.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image_name)
+    try:
+        # The image and the reused variants are not collected meanwhile.
+        with transaction.atomic():
+            advisory_lock(get_media_lock_key(image_name))
+            recipe.update(image_variants=get_variants(image_name))
+    except Exception:
+        logger.exception('Failed to resize the image of recipe %s', recipe_id)
+        recipe.update(image_variants={'source': image_name})
+    finally:
+        # Connections of the pool threads are never closed by requests.
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    """Generates the variants in the pool once the transaction commits."""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    # A recipe may be saved several times by one request.
+    if getattr(recipe, '_scheduled_image', None) == image_name:
+        return
+    recipe._scheduled_image = image_name
+    transaction.on_commit(
+        lambda: executor.submit(generate_variants, recipe_id, image_name)
+    )
+
+
+def get_image_files(image_name, variants):
+    """Storage names of the image and of its variants."""
+    if not image_name:
+        return []
+    files = [image_name]
+    if variants.get('source') == image_name:
+        files.extend(
+            name for variant, name in variants.items() if variant != 'source'
+        )
+
+    return files
+
+
+def collect_garbage(image_name, variants):
+    """
+    Deletes the image and its variants if no recipe references them.
+
+    Identical uploads are stored once, so a file is deleted only
+    when the count of the recipes referencing it drops to zero.
+    The references are counted by the recipe rows themselves
+    and can not drift from them. The lock of the image name waits
+    for uploads reusing the file, so their recipes are counted.
+    """
+    if not image_name:
+        return
+    with transaction.atomic():
+        advisory_lock(get_media_lock_key(image_name))
+        if Recipe.objects.filter(image=image_name).exists():
+            return
+        for name in get_image_files(image_name, variants):
+            default_storage.delete(name)
+
+
+def schedule_garbage_collection(image_name, variants):
+    """Collects the files once the transaction commits."""
+    transaction.on_commit(lambda: collect_garbage(image_name, variants))
@@ -0,0 +1,195 @@
+"""
+Bulk idempotent loaders of reference data.
+
+Rows are streamed from a CSV or JSON file and only the rows
+missing in the database are inserted, so loading the same file
+again changes nothing.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 64 * 1024
+# Whitespace and commas between the items of a JSON list.
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_json_list(file):
+    """
+    Streams the items of the JSON list in the file.
+
+    The file is read by chunks and every complete item is decoded
+    as soon as it is read, so the whole list is never in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = finished = False
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while not finished:
+            position = SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('The JSON file must contain a list.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                finished = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk.
+                break
+            if end == len(buffer):
+                # A number may continue in the next chunk.
+                break
+            position = end
+            yield item
+    if not finished:
+        raise ValueError('The JSON list is incomplete or invalid.')
+
+
+def read_rows(path, fields):
+    """
+    Streams rows of the file as dicts of the fields.
+
+    CSV files contain the fields in order without a header,
+    JSON files contain a list of objects.
+    """
+    with open(path, encoding='utf-8') as file:
+        if os.path.splitext(path)[1].lower() == '.json':
+            for item in read_json_list(file):
+                yield {field: item[field] for field in fields}
+            return
+        for row in csv.reader(file, delimiter=','):
+            if row:
+                yield dict(zip(fields, row))
+
+
+def bulk_insert(model, rows, key_fields):
+    """
+    Inserts the rows missing in the database by bulk_create.
+
+    The keys of the existing rows are loaded once
+    and the rows are compared with them in memory.
+    """
+    existing = set(model.objects.values_list(*key_fields))
+
+    def new_objects():
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key not in existing:
+                existing.add(key)
+                yield model(**row)
+
+    objects = new_objects()
+    while batch := list(islice(objects, BATCH_SIZE)):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class CsvStream:
+    """
+    Read-only file object with the rows in CSV format.
+
+    The rows are formatted on demand as the file is read,
+    so COPY streams them without keeping the whole file in memory.
+    """
+
+    def __init__(self, rows):
+        self.lines = self.format_lines(rows)
+        self.buffer = ''
+
+    @staticmethod
+    def format_lines(rows):
+        line = io.StringIO()
+        writer = csv.writer(line)
+        for row in rows:
+            writer.writerow(row)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+
+    def read(self, size=-1):
+        parts = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        data = ''.join(parts)
+        if size < 0:
+            size = length
+        self.buffer = data[size:]
+
+        return data[:size]
+
+
+def copy_insert(model, rows, fields):
+    """
+    Inserts the rows missing in the database by PostgreSQL COPY.
+
+    The rows are streamed into a temporary staging table
+    and moved by one INSERT ... ON CONFLICT DO NOTHING.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    columns = ', '.join(
+        quote_name(model._meta.get_field(field).column) for field in fields
+    )
+    stream = CsvStream([row[field] for field in fields] for row in rows)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE loader_staging ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        cursor.copy_expert(
+            f'COPY loader_staging ({columns}) FROM STDIN WITH (FORMAT csv)',
+            stream,
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT DISTINCT {columns} FROM loader_staging '
+            f'ON CONFLICT DO NOTHING'
+        )
+
+
+def load(model, path, fields, key_fields):
+    """
+    Loads the rows of the file missing in the database.
+
+    Uses COPY on PostgreSQL and bulk_create on other databases.
+    Returns the numbers of the read and created rows and the duration.
+    """
+    started = time.monotonic()
+    count_before = model.objects.count()
+    read = 0
+
+    def counted(rows):
+        nonlocal read
+        for row in rows:
+            read += 1
+            yield row
+
+    rows = counted(read_rows(path, fields))
+    if connection.vendor == 'postgresql':
+        copy_insert(model, rows, fields)
+    else:
+        bulk_insert(model, rows, key_fields)
+    created = model.objects.count() - count_before
+
+    return read, created, time.monotonic() - started
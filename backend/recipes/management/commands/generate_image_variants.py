@@ -0,0 +1,63 @@
+"""
+Custom django-admin command to generate missing recipe image variants.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.sql import advisory_lock
+from core.storage import get_media_lock_key
+from recipes.images import get_variants, is_generated, make_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Command to generate the resized variants of recipe images
+    that have none, failed or were made for a replaced image:
+    python manage.py generate_image_variants
+    command in docker container:
+    docker compose exec backend python manage.py generate_image_variants
+    """
+
+    help = 'Generating missing variants of recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate the variants of all recipe images.',
+        )
+
+    def handle(self, **kwargs):
+        starting_message = '***Starting generating image variants!!!***'
+        self.stdout.write(self.style.WARNING(f'{starting_message}'))
+        generated = failed = 0
+        recipes = Recipe.objects.exclude(image='').only(
+            'image', 'image_variants'
+        )
+        for recipe in recipes.iterator():
+            if not kwargs['all'] and is_generated(
+                recipe.image_variants, recipe.image.name
+            ):
+                continue
+            generate = make_variants if kwargs['all'] else get_variants
+            image_name = recipe.image.name
+            try:
+                # The image and the reused variants are not collected
+                # until the variants are stored.
+                with transaction.atomic():
+                    advisory_lock(get_media_lock_key(image_name))
+                    Recipe.objects.filter(
+                        pk=recipe.pk, image=image_name
+                    ).update(image_variants=generate(image_name))
+            except Exception as error:
+                self.stdout.write(self.style.ERROR(
+                    f'***Image of recipe {recipe.pk} failed: {error}***'
+                ))
+                failed += 1
+                continue
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'***Variants of {generated} images generated, '
+            f'{failed} failed!***'
+        ))
@@ -1,41 +1,57 @@
 """
-Custom django-admin command to load data from csv files.
+Custom django-admin command to load data from csv or json files.
 """
 import os
-import csv
 
 from django.core.management.base import BaseCommand
 
+from core.cache import INGREDIENTS_NAMESPACE, bump_data_version
+from recipes.loaders import load
 from recipes.models import Ingredient
 
+DEFAULT_FILE_PATHS = ('./data/ingredients.csv', './data/ingredients.json')
+
 
 class Command(BaseCommand):
     """
-    Command to import data from csv file into databases:
-    python Manage.py import_ingredients_data
+    Command to import data from csv or json file into databases:
+    python Manage.py import_ingredients_data [--file data/ingredients.json]
     in a docker container:
     docker compose exec backend python manage.py import_ingredients_data
+
+    Only the ingredients missing in the database are inserted.
     """
 
     help = 'Filling out the ingredients database.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            help='Path to a csv or json file with the ingredients.',
+        )
+
     def handle(self, **kwargs):
         starting_message = (
             '***Starting filling out the ingredients database!!!***'
         )
         self.stdout.write(self.style.WARNING(f'{starting_message}'))
-        ingredients_file_path = './data/ingredients.csv'
-        if os.path.exists(ingredients_file_path):
-            with open(ingredients_file_path, encoding='utf-8') as file:
-                reader = csv.reader(file, delimiter=',')
-                for row in reader:
-                    Ingredient.objects.get_or_create(
-                        name=row[0],
-                        measurement_unit=row[1]
-                    )
-            self.stdout.write(
-                self.style.SUCCESS('***Ingredient data loaded!***')
+        paths = (kwargs['file'],) if kwargs['file'] else DEFAULT_FILE_PATHS
+        ingredients_file_path = next(
+            (path for path in paths if os.path.exists(path)), None
+        )
+        if ingredients_file_path:
+            read, created, duration = load(
+                Ingredient,
+                ingredients_file_path,
+                fields=('name', 'measurement_unit'),
+                key_fields=('name', 'measurement_unit'),
             )
+            if created:
+                bump_data_version(INGREDIENTS_NAMESPACE)
+            self.stdout.write(self.style.SUCCESS(
+                f'***Ingredient data loaded: {read} rows read, '
+                f'{created} created in {duration:.2f} s!***'
+            ))
         else:
             self.stdout.write(
                 self.style.ERROR('***File ingredients.csv not found!***')
@@ -1,39 +1,55 @@
 """
-Custom django-admin command to load data from csv files.
+Custom django-admin command to load data from csv or json files.
 """
 import os
-import csv
 
 from django.core.management.base import BaseCommand
 
+from core.cache import TAGS_NAMESPACE, bump_data_version
+from recipes.loaders import load
 from recipes.models import Tag
 
+DEFAULT_FILE_PATHS = ('./data/tags.csv', './data/tags.json')
+
 
 class Command(BaseCommand):
     """
-    Command to import data from csv file into database:
-    python manage.py import_tags_data
+    Command to import data from csv or json file into database:
+    python manage.py import_tags_data [--file data/tags.json]
     command in docker container:
     docker compose exec backend python manage.py import_tags_data
+
+    Only the tags missing in the database are inserted.
     """
 
     help = 'Filling out the tag database.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            help='Path to a csv or json file with the tags.',
+        )
+
     def handle(self, **kwargs):
         starting_message = '***Starting filling out the tag database!!!***'
         self.stdout.write(self.style.WARNING(f'{starting_message}'))
-        tags_file_path = './data/tags.csv'
-        if os.path.exists(tags_file_path):
-            with open(tags_file_path, encoding='utf-8') as file:
-                reader = csv.reader(file, delimiter=',')
-                for row in reader:
-                    name, color, slug = row
-                    Tag.objects.get_or_create(
-                        name=name,
-                        color=color,
-                        slug=slug
-                    )
-            self.stdout.write(self.style.SUCCESS('***Tag data loaded!***'))
+        paths = (kwargs['file'],) if kwargs['file'] else DEFAULT_FILE_PATHS
+        tags_file_path = next(
+            (path for path in paths if os.path.exists(path)), None
+        )
+        if tags_file_path:
+            read, created, duration = load(
+                Tag,
+                tags_file_path,
+                fields=('name', 'color', 'slug'),
+                key_fields=('name', 'color', 'slug'),
+            )
+            if created:
+                bump_data_version(TAGS_NAMESPACE)
+            self.stdout.write(self.style.SUCCESS(
+                f'***Tag data loaded: {read} rows read, '
+                f'{created} created in {duration:.2f} s!***'
+            ))
         else:
             self.stdout.write(
                 self.style.ERROR('***File tags.csv not found!***')
@@ -0,0 +1,29 @@
+"""
+Custom django-admin command to rebuild the precomputed shopping lists.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingListItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Command to recompute the shopping lists of all users:
+    python manage.py rebuild_shopping_lists
+    command in docker container:
+    docker compose exec backend python manage.py rebuild_shopping_lists
+    """
+
+    help = 'Rebuilding the shopping lists of all users.'
+
+    def handle(self, **kwargs):
+        starting_message = '***Starting rebuilding the shopping lists!!!***'
+        self.stdout.write(self.style.WARNING(f'{starting_message}'))
+        ShoppingListItem.refresh(User.objects.values('pk'))
+        self.stdout.write(self.style.SUCCESS(
+            f'***{ShoppingListItem.objects.count()} '
+            f'shopping list items rebuilt!***'
+        ))
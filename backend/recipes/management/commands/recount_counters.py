@@ -0,0 +1,51 @@
+"""
+Custom django-admin command to recompute denormalized counters.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+
+def count_rows(model, field_name):
+    """Number of 'model' rows referencing the outer object by 'field_name'."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field_name: OuterRef('pk')}).order_by()
+            .values(field_name).annotate(count=Count('pk')).values('count')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    """
+    Command to repair the counters of recipes and users:
+    python manage.py recount_counters
+    command in docker container:
+    docker compose exec backend python manage.py recount_counters
+    """
+
+    help = 'Recomputing the counters of recipes and users.'
+
+    @atomic
+    def handle(self, **kwargs):
+        starting_message = '***Starting recomputing the counters!!!***'
+        self.stdout.write(self.style.WARNING(f'{starting_message}'))
+        recipes = Recipe.objects.update(
+            favorites_count=count_rows(Favorite, 'recipe'),
+            in_carts_count=count_rows(ShoppingCart, 'recipe'),
+        )
+        users = User.objects.update(
+            recipes_count=count_rows(Recipe, 'author'),
+            followers_count=count_rows(Follow, 'author'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'***Counters of {recipes} recipes and {users} users updated!***'
+        ))
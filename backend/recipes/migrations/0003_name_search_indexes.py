@@ -0,0 +1,47 @@
+from django.db import migrations
+
+INDEXES = (
+    (
+        'recipes_ingredient_name_like_idx',
+        'recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+    ),
+    (
+        'recipes_ingredient_name_trgm_idx',
+        'recipes_ingredient USING gin (name gin_trgm_ops)',
+    ),
+    (
+        'recipes_recipe_name_like_idx',
+        'recipes_recipe (UPPER(name::text) text_pattern_ops)',
+    ),
+    (
+        'recipes_recipe_name_trgm_idx',
+        'recipes_recipe USING gin (name gin_trgm_ops)',
+    ),
+)
+
+
+def create_indexes(apps, schema_editor):
+    """Pattern and trigram indexes exist only in PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:36
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The vector of a recipe: name (weight A), text (B), ingredient names (C).
+CREATE_SQL = """
+CREATE OR REPLACE FUNCTION recipes_recipe_search_vector(
+    recipe_id bigint, recipe_name text, recipe_text text
+) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('russian', coalesce($2, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce($3, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientinrecipe AS amount
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = amount.ingredient_id
+            WHERE amount.recipe_id = $1
+        ), '')), 'C')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := recipes_recipe_search_vector(
+        NEW.id, NEW.name, NEW.text
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipe_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_trigger();
+
+CREATE OR REPLACE FUNCTION recipes_ingredientinrecipe_search_vector_trigger()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE recipes_recipe
+    SET search_vector = recipes_recipe_search_vector(id, name, text)
+    WHERE id IN (SELECT recipe_id FROM changed_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_ingredientinrecipe_search_vector_insert
+    AFTER INSERT ON recipes_ingredientinrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recipes_ingredientinrecipe_search_vector_trigger();
+
+CREATE TRIGGER recipes_ingredientinrecipe_search_vector_update
+    AFTER UPDATE ON recipes_ingredientinrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recipes_ingredientinrecipe_search_vector_trigger();
+
+CREATE TRIGGER recipes_ingredientinrecipe_search_vector_delete
+    AFTER DELETE ON recipes_ingredientinrecipe
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recipes_ingredientinrecipe_search_vector_trigger();
+
+CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector);
+
+UPDATE recipes_recipe
+SET search_vector = recipes_recipe_search_vector(id, name, text);
+"""
+
+DROP_SQL = """
+DROP INDEX IF EXISTS recipes_recipe_search_vector_idx;
+DROP TRIGGER IF EXISTS recipes_ingredientinrecipe_search_vector_delete
+    ON recipes_ingredientinrecipe;
+DROP TRIGGER IF EXISTS recipes_ingredientinrecipe_search_vector_update
+    ON recipes_ingredientinrecipe;
+DROP TRIGGER IF EXISTS recipes_ingredientinrecipe_search_vector_insert
+    ON recipes_ingredientinrecipe;
+DROP FUNCTION IF EXISTS recipes_ingredientinrecipe_search_vector_trigger();
+DROP TRIGGER IF EXISTS recipes_recipe_search_vector_update ON recipes_recipe;
+DROP FUNCTION IF EXISTS recipes_recipe_search_vector_trigger();
+DROP FUNCTION IF EXISTS recipes_recipe_search_vector(bigint, text, text);
+"""
+
+
+def create_search_vector_triggers(apps, schema_editor):
+    """The search vector is maintained by triggers only in PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_search_vector_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Full-text search vector.'),
+        ),
+        migrations.RunPython(
+            create_search_vector_triggers, drop_search_vector_triggers
+        ),
+    ]
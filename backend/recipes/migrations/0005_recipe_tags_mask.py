@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:37
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+MAX_MASK_TAG_ID = 63
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    masks = defaultdict(int)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    ):
+        if 0 < tag_id <= MAX_MASK_TAG_ID:
+            masks[recipe_id] |= 1 << (tag_id - 1)
+    recipes_by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        recipes_by_mask[mask].append(recipe_id)
+    for mask, recipe_ids in recipes_by_mask.items():
+        Recipe.objects.filter(pk__in=recipe_ids).update(tags_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Bitmask of recipe tags.'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
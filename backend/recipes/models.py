@@ -3,11 +3,13 @@ Module for creating, configuring and managing `recipe' app models.
 """
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils.html import format_html
 from colorfield.fields import ColorField
 
 from core.constants import HelpTextRecipes, ConstantRecipes
+from core.mixins import CountersMixin
 from core.models import UserRecipe
 
 
@@ -75,9 +77,11 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Recipe model."""
 
+    counter_fields = ('favorites_count', 'in_carts_count')
+
     name = models.CharField(
         max_length=ConstantRecipes.MAX_NAME_LENGTH,
         verbose_name='Recipe name',
@@ -132,6 +136,32 @@ class Recipe(models.Model):
         verbose_name='Recipe publication date.',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Number of additions to favorites.',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Number of additions to shopping carts.',
+    )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Bitmask of recipe tags.',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Full-text search vector.',
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Resized variants of the recipe image.',
+    )
 
     class Meta:
         verbose_name = 'Recipe'
@@ -140,6 +170,33 @@ class Recipe(models.Model):
             'name',
             'pub_date',
         )
+        indexes = (
+            models.Index(
+                fields=('pub_date', 'id'),
+                name='recipe_pub_date_id_idx',
+            ),
+        )
+
+    @staticmethod
+    def get_tags_mask(tag_ids):
+        """
+        Bitmask of the tags, the tag with id N sets bit N - 1.
+
+        Tags with ids above 'MAX_MASK_TAG_ID' are not included.
+        """
+        mask = 0
+        for tag_id in tag_ids:
+            if 0 < tag_id <= ConstantRecipes.MAX_MASK_TAG_ID:
+                mask |= 1 << (tag_id - 1)
+
+        return mask
+
+    def update_tags_mask(self):
+        """Stores the bitmask of the current recipe tags."""
+        self.tags_mask = self.get_tags_mask(
+            self.tags.values_list('id', flat=True)
+        )
+        Recipe.objects.filter(pk=self.pk).update(tags_mask=self.tags_mask)
 
     def formatted_text(self):
         return format_html('<br>'.join(self.text.splitlines()))
@@ -190,6 +247,8 @@ class IngredientInRecipe(models.Model):
 class Favorite(UserRecipe):
     """Favorites model."""
 
+    counter_field = 'favorites_count'
+
     class Meta(UserRecipe.Meta):
         default_related_name = 'favorites'
         verbose_name = 'Favorites'
@@ -208,6 +267,8 @@ class Favorite(UserRecipe):
 class ShoppingCart(UserRecipe):
     """ShoppingCart model."""
 
+    counter_field = 'in_carts_count'
+
     class Meta(UserRecipe.Meta):
         default_related_name = 'shopping_cart'
         verbose_name = 'Shopping cart'
@@ -221,3 +282,141 @@ class ShoppingCart(UserRecipe):
 
     def __str__(self):
         return f'{self.recipe} from {self.user} shopping cart'
+
+    @classmethod
+    def bulk_changed(cls, user, recipe_ids, delta):
+        super().bulk_changed(user, recipe_ids, delta)
+        ShoppingListItem.change_recipes(user.pk, recipe_ids, delta)
+
+
+class ShoppingListItem(models.Model):
+    """
+    Total amount of an ingredient in the user's shopping cart.
+
+    Precomputed aggregate of 'IngredientInRecipe' over the recipes
+    in the shopping cart. Adding or removing recipes changes the totals
+    by 'change_recipes', changed recipe ingredients are recomputed
+    by 'refresh'. Both lock the rows of the users first, so concurrent
+    changes of one shopping list are applied one after another.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='User',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ingredient',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Total amount of the ingredient',
+    )
+
+    class Meta:
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        ordering = ('ingredient',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    @staticmethod
+    def lock_users(user_ids):
+        """Locks the rows of the users until the transaction ends."""
+        list(
+            User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+    @classmethod
+    def change_recipes(cls, user_id, recipe_ids, sign):
+        """
+        Adds (sign=1) or subtracts (sign=-1) the ingredients
+        of the recipes to or from the shopping list of the user.
+
+        Only the items of the ingredients of the recipes are changed,
+        the items whose total drops to zero are deleted.
+        """
+        with transaction.atomic():
+            cls.lock_users((user_id,))
+            amounts = dict(
+                IngredientInRecipe.objects.filter(
+                    recipe__in=recipe_ids
+                ).values('ingredient').order_by().annotate(
+                    total=models.Sum('amount')
+                ).values_list('ingredient', 'total')
+            )
+            if not amounts:
+                return
+            items = {
+                item.ingredient_id: item
+                for item in cls.objects.filter(
+                    user_id=user_id, ingredient__in=amounts
+                )
+            }
+            changed, removed, added = [], [], []
+            for ingredient_id, amount in amounts.items():
+                item = items.get(ingredient_id)
+                if item is None:
+                    if sign > 0:
+                        added.append(cls(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=amount,
+                        ))
+                    continue
+                item.total_amount += sign * amount
+                if item.total_amount > 0:
+                    changed.append(item)
+                else:
+                    removed.append(item.pk)
+            if removed:
+                cls.objects.filter(pk__in=removed).delete()
+            if changed:
+                cls.objects.bulk_update(changed, ('total_amount',))
+            if added:
+                cls.objects.bulk_create(added)
+
+    @classmethod
+    def refresh(cls, user_ids, ingredient_ids=None):
+        """
+        Recomputes the shopping list items of the users.
+
+        'user_ids' and 'ingredient_ids' are lists or subqueries,
+        without 'ingredient_ids' all items of the users are recomputed.
+        """
+        amounts = IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__user__in=user_ids
+        )
+        items = cls.objects.filter(user__in=user_ids)
+        if ingredient_ids is not None:
+            amounts = amounts.filter(ingredient__in=ingredient_ids)
+            items = items.filter(ingredient__in=ingredient_ids)
+        totals = amounts.values(
+            'ingredient', cart_user=models.F('recipe__shopping_cart__user')
+        ).order_by().annotate(total_amount=models.Sum('amount'))
+        with transaction.atomic():
+            cls.lock_users(user_ids)
+            items.delete()
+            cls.objects.bulk_create(
+                (
+                    cls(
+                        user_id=total['cart_user'],
+                        ingredient_id=total['ingredient'],
+                        total_amount=total['total_amount'],
+                    )
+                    for total in totals.iterator()
+                ),
+                batch_size=1000,
+            )
+
+    def __str__(self):
+        return f'{self.ingredient}:{self.total_amount} for {self.user}'
@@ -0,0 +1,100 @@
+"""
+Search over recipes app data.
+"""
+import threading
+from bisect import bisect_left
+
+from django.db.models import Count, Max
+
+from core.cache import INGREDIENTS_NAMESPACE, get_data_version, is_cache_shared
+from .models import Ingredient
+
+
+def fold_name(value):
+    """Case folding of names, the letter 'ё' is treated as 'е'."""
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    In-memory prefix index over the ingredient catalog.
+
+    Folded ingredient names are kept in a sorted array, so prefix
+    matches are found by binary search. The index is rebuilt
+    when the version of the ingredients data changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ((), ())
+
+    @staticmethod
+    def get_version():
+        """
+        Version of the ingredients data.
+
+        A local cache does not see the versions bumped by other
+        processes, so the number and the last id of the ingredients
+        are added, which change with the imports of every process.
+        """
+        version = get_data_version(INGREDIENTS_NAMESPACE)
+        if is_cache_shared():
+            return version
+
+        return version, *Ingredient.objects.aggregate(
+            Count('id'), Max('id')
+        ).values()
+
+    def refresh(self):
+        """Rebuilds the index if the ingredients have changed."""
+        version = self.get_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+            ingredients = sorted(
+                (fold_name(name), name, pk, measurement_unit)
+                for pk, name, measurement_unit in rows
+            )
+            self._data = (
+                tuple(ingredient[0] for ingredient in ingredients),
+                tuple(
+                    {
+                        'id': pk,
+                        'name': name,
+                        'measurement_unit': measurement_unit,
+                    }
+                    for _, name, pk, measurement_unit in ingredients
+                ),
+            )
+            self._version = version
+
+    def search(self, name):
+        """
+        Ingredients whose names contain 'name'.
+
+        Names starting with 'name' come first, then the other matches.
+        """
+        self.refresh()
+        keys, ingredients = self._data
+        key = fold_name(name)
+        position = bisect_left(keys, key)
+        prefix_matches = []
+        while position < len(keys) and keys[position].startswith(key):
+            prefix_matches.append(ingredients[position])
+            position += 1
+        substring_matches = [
+            ingredient
+            for folded_name, ingredient in zip(keys, ingredients)
+            if key in folded_name and not folded_name.startswith(key)
+        ]
+
+        return prefix_matches + substring_matches
+
+
+ingredient_index = IngredientIndex()
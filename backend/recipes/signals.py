@@ -0,0 +1,182 @@
+"""
+Signal handlers of the "recipes" app.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.cache import (
+    COUNTS_NAMESPACE,
+    INGREDIENTS_NAMESPACE,
+    TAGS_NAMESPACE,
+    bump_data_version,
+)
+from .images import schedule_garbage_collection, schedule_variants
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_counts(**kwargs):
+    """Invalidates cached counts of paginated recipe lists."""
+    bump_data_version(COUNTS_NAMESPACE)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    """Invalidates cached tag responses."""
+    bump_data_version(TAGS_NAMESPACE)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    """Invalidates cached ingredient responses."""
+    bump_data_version(INGREDIENTS_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps 'Recipe.tags_mask' in sync with the recipe tags.
+
+    Clearing the recipes of a tag sends no primary keys,
+    so the recipes of the tag are remembered before the clear.
+    """
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.update_tags_mask()
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_recipe_ids', None)
+    recipes = Recipe.objects.filter(pk__in=pk_set) if pk_set else ()
+    for recipe in recipes:
+        recipe.update_tags_mask()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counters(sender, instance, created, **kwargs):
+    """Counts a recipe added to favorites or a shopping cart."""
+    if created:
+        sender.change_counters((instance.recipe_id,), 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counters(sender, instance, **kwargs):
+    """Counts a recipe removed from favorites or a shopping cart."""
+    sender.change_counters((instance.recipe_id,), -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    """Counts a recipe of the author."""
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    """Counts a deleted recipe of the author."""
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F('recipes_count') - 1
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Adds the ingredients of a recipe put into the shopping cart."""
+    if created:
+        ShoppingListItem.change_recipes(
+            instance.user_id, (instance.recipe_id,), 1
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """
+    Subtracts the ingredients of a recipe removed from the cart.
+
+    When the recipe itself is deleted, its ingredients may be deleted
+    first. Then they are recomputed by 'update_shopping_lists'
+    and nothing is left to subtract here.
+    """
+    ShoppingListItem.change_recipes(
+        instance.user_id, (instance.recipe_id,), -1
+    )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def update_shopping_lists(instance, **kwargs):
+    """Recomputes the ingredient for users with the recipe in the cart."""
+    ShoppingListItem.refresh(
+        ShoppingCart.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values('user'),
+        (instance.ingredient_id,),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_variants(instance, **kwargs):
+    """Schedules the resized variants of a new or replaced image."""
+    if (
+        instance.image
+        and instance.image_variants.get('source') != instance.image.name
+    ):
+        schedule_variants(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_image(instance, **kwargs):
+    """Remembers the stored image of an existing recipe."""
+    if not instance._state.adding:
+        instance._stored_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', 'image_variants').first()
+
+
+@receiver(post_save, sender=Recipe)
+def collect_replaced_image(instance, **kwargs):
+    """Deletes the files of a replaced image no recipe uses anymore."""
+    stored_image = getattr(instance, '_stored_image', None)
+    if stored_image and stored_image[0] != instance.image.name:
+        schedule_garbage_collection(*stored_image)
+
+
+@receiver(post_delete, sender=Recipe)
+def collect_deleted_image(instance, **kwargs):
+    """Deletes the files of a deleted recipe no recipe uses anymore."""
+    schedule_garbage_collection(instance.image.name, instance.image_variants)
@@ -0,0 +1,559 @@
+"""
+Tests of the `recipes' app.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from django.contrib import admin
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.cache import INGREDIENTS_NAMESPACE, bump_data_version
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from recipes import images, loaders
+from recipes.management.commands import generate_image_variants
+from recipes.search import IngredientIndex
+
+User = get_user_model()
+
+PAGE_SIZES = (10, 100)
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Changelist pages are read by a constant number of queries."""
+
+    # Session, user, count and rows, plus the list filter choices.
+    changelist_queries = {
+        Recipe: 5,
+        Tag: 8,
+        Ingredient: 5,
+        IngredientInRecipe: 4,
+        Favorite: 4,
+        ShoppingCart: 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@foodgram.ru',
+            username='admin',
+            first_name='Admin',
+            last_name='Admin',
+            password='password',
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            )
+            for i in range(2)
+        ]
+        for i in range(max(PAGE_SIZES)):
+            user = User.objects.create_user(
+                email=f'user{i}@foodgram.ru',
+                username=f'user{i}',
+                first_name='User',
+                last_name='User',
+                password='password',
+            )
+            ingredient = Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='g'
+            )
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}',
+                author=user,
+                text='text',
+                cooking_time=1,
+                image='recipes/recipe.jpg',
+            )
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        for model, num in self.changelist_queries.items():
+            model_admin = type(admin.site._registry[model])
+            url = reverse(
+                f'admin:{model._meta.app_label}_'
+                f'{model._meta.model_name}_changelist'
+            )
+            for page_size in PAGE_SIZES:
+                with self.subTest(model=model.__name__, page_size=page_size):
+                    with mock.patch.object(
+                        model_admin, 'list_per_page', page_size
+                    ), self.assertNumQueries(num):
+                        response = self.client.get(url)
+                    self.assertEqual(
+                        len(response.context['cl'].result_list),
+                        min(page_size, model.objects.count()),
+                    )
+
+
+class IngredientIndexTest(TestCase):
+    """The ingredient index follows the catalog in every process."""
+
+    names = ('Мёд', 'Медовик', 'Гречишный мед', 'Молоко')
+
+    def setUp(self):
+        cache.clear()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='g') for name in self.names
+        )
+        self.index = IngredientIndex()
+
+    def search(self, name):
+        return [ingredient['name'] for ingredient in self.index.search(name)]
+
+    def test_search(self):
+        self.assertEqual(
+            self.search('МЕД'), ['Мёд', 'Медовик', 'Гречишный мед']
+        )
+        self.assertEqual(self.search('мол'), ['Молоко'])
+        self.assertEqual(self.search('сахар'), [])
+
+    def test_local_cache_import(self):
+        self.search('мед')
+        # Imports of other processes bump only their own local version.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Медуница', measurement_unit='g')]
+        )
+        self.assertIn('Медуница', self.search('мед'))
+
+    @mock.patch('recipes.search.is_cache_shared', return_value=True)
+    def test_shared_cache_import(self, is_cache_shared):
+        self.search('мед')
+        with self.assertNumQueries(0):
+            self.search('мед')
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Медуница', measurement_unit='g')]
+        )
+        bump_data_version(INGREDIENTS_NAMESPACE)
+        self.assertIn('Медуница', self.search('мед'))
+
+
+def create_recipe(author, name, amounts):
+    """Recipe with the ingredient amounts given by a dict."""
+    recipe = Recipe.objects.create(
+        name=name,
+        author=author,
+        text='text',
+        cooking_time=1,
+        image='recipes/recipe.jpg',
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in amounts.items()
+    )
+
+    return recipe
+
+
+class ShoppingListTest(TestCase):
+    """The shopping list totals follow the shopping cart and recipes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='User',
+            last_name='User',
+            password='password',
+        )
+        cls.flour, cls.milk = (
+            Ingredient.objects.create(name=name, measurement_unit='g')
+            for name in ('flour', 'milk')
+        )
+        cls.pancakes = create_recipe(
+            cls.user, 'pancakes', {cls.flour: 200, cls.milk: 500}
+        )
+        cls.bread = create_recipe(cls.user, 'bread', {cls.flour: 500})
+
+    def get_totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(
+                user=self.user
+            ).values_list('ingredient__name', 'total_amount')
+        )
+
+    def test_cart_changes(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        self.assertEqual(self.get_totals(), {'flour': 200, 'milk': 500})
+        ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        self.assertEqual(self.get_totals(), {'flour': 700, 'milk': 500})
+        ShoppingCart.objects.get(recipe=self.pancakes).delete()
+        self.assertEqual(self.get_totals(), {'flour': 500})
+        ShoppingCart.objects.get(recipe=self.bread).delete()
+        self.assertEqual(self.get_totals(), {})
+
+    def test_bulk_cart_changes(self):
+        ShoppingCart.bulk_add(self.user, [self.pancakes.pk, self.bread.pk])
+        self.assertEqual(self.get_totals(), {'flour': 700, 'milk': 500})
+        ShoppingCart.bulk_remove(self.user, [self.bread.pk])
+        self.assertEqual(self.get_totals(), {'flour': 200, 'milk': 500})
+
+    def test_recipe_changes(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        IngredientInRecipe.objects.filter(
+            recipe=self.bread, ingredient=self.flour
+        ).get().delete()
+        self.assertEqual(self.get_totals(), {'flour': 200, 'milk': 500})
+        item = IngredientInRecipe.objects.get(
+            recipe=self.pancakes, ingredient=self.milk
+        )
+        item.amount = 300
+        item.save()
+        self.assertEqual(self.get_totals(), {'flour': 200, 'milk': 300})
+        self.pancakes.delete()
+        self.assertEqual(self.get_totals(), {})
+
+
+@skipUnless(
+    connection.features.has_select_for_update, 'Needs row locks'
+)
+class ShoppingListLockTest(TransactionTestCase):
+    """Changes of one shopping list wait for the lock of the user."""
+
+    def test_lock_users(self):
+        user = User.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='User',
+            last_name='User',
+            password='password',
+        )
+        flour = Ingredient.objects.create(name='flour', measurement_unit='g')
+        recipe = create_recipe(user, 'bread', {flour: 500})
+        locked, changed = threading.Event(), threading.Event()
+
+        def add_to_cart():
+            try:
+                locked.wait()
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+                changed.set()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=add_to_cart)
+        thread.start()
+        with transaction.atomic():
+            ShoppingListItem.lock_users((user.pk,))
+            locked.set()
+            # The other transaction waits for this one.
+            self.assertFalse(changed.wait(0.5))
+            self.assertFalse(ShoppingListItem.objects.exists())
+        thread.join()
+        self.assertTrue(changed.is_set())
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=user).total_amount, 500
+        )
+
+
+def make_image(size, color='red'):
+    """PNG image file of the size."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+
+    return ContentFile(buffer.getvalue(), 'photo.png')
+
+
+class MediaTestCase(TestCase):
+    """
+    Recipes with images stored in a temporary media directory.
+
+    The variants are generated as soon as the test transaction
+    would commit, without the thread pool.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Author',
+            last_name='Author',
+            password='password',
+        )
+
+    def setUp(self):
+        submit = mock.patch.object(
+            images.executor,
+            'submit',
+            side_effect=lambda function, *args: function(*args),
+        )
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+        # The test connection is kept open by the pool tasks.
+        connections = mock.patch.object(images, 'connections')
+        connections.start()
+        self.addCleanup(connections.stop)
+
+    def save_recipe(self, recipe=None, image=None):
+        """Saves the recipe, committing its image changes."""
+        if recipe is None:
+            recipe = Recipe(
+                name='recipe', author=self.user, text='text', cooking_time=1
+            )
+        if image is not None:
+            recipe.image = image
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        recipe.refresh_from_db()
+
+        return recipe
+
+    def delete_recipe(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+
+class ImageVariantsTest(MediaTestCase):
+    """Resized variants are generated once per stored image."""
+
+    def test_variants(self):
+        recipe = self.save_recipe(image=make_image((2000, 1000)))
+        variants = recipe.image_variants
+        self.assertTrue(images.is_generated(variants, recipe.image.name))
+        self.assertEqual(set(variants), {
+            'source',
+            *settings.IMAGE_VARIANTS,
+            *(f'{variant}_webp' for variant in settings.IMAGE_VARIANTS),
+        })
+        for variant, size in settings.IMAGE_VARIANTS.items():
+            for name in (variants[variant], variants[f'{variant}_webp']):
+                with default_storage.open(name) as file, \
+                        Image.open(file) as image:
+                    self.assertEqual(image.size, (size[0], size[0] // 2))
+
+    def test_reused_variants(self):
+        first = self.save_recipe(image=make_image((100, 100)))
+        with mock.patch.object(images, 'make_variants') as make_variants:
+            second = self.save_recipe(image=make_image((100, 100)))
+        make_variants.assert_not_called()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_variants, first.image_variants)
+
+    def test_unchanged_image(self):
+        recipe = self.save_recipe(image=make_image((100, 100)))
+        self.submit.reset_mock()
+        recipe.name = 'new name'
+        self.save_recipe(recipe)
+        self.submit.assert_not_called()
+
+    def test_failure(self):
+        with self.assertLogs(images.logger, 'ERROR'):
+            recipe = self.save_recipe(image='recipes/missing.png')
+        self.assertEqual(
+            recipe.image_variants, {'source': 'recipes/missing.png'}
+        )
+        self.assertFalse(
+            images.is_generated(recipe.image_variants, recipe.image.name)
+        )
+        # The failure is not retried by later saves.
+        self.submit.reset_mock()
+        self.save_recipe(recipe)
+        self.submit.assert_not_called()
+
+
+class GenerateImageVariantsCommandTest(MediaTestCase):
+    """The command fills in missing variants under the image lock."""
+
+    def call_command(self, *args):
+        stdout = io.StringIO()
+        with mock.patch.object(
+            generate_image_variants,
+            'advisory_lock',
+            side_effect=lambda key: self.assertTrue(
+                connection.in_atomic_block
+            ),
+        ) as advisory_lock:
+            call_command('generate_image_variants', *args, stdout=stdout)
+
+        return advisory_lock, stdout.getvalue()
+
+    def test_missing_variants(self):
+        recipe = self.save_recipe(image=make_image((100, 100)))
+        generated = recipe.image_variants
+        with self.assertLogs(images.logger, 'ERROR'):
+            broken = self.save_recipe(image='recipes/missing.png')
+        Recipe.objects.filter(pk=recipe.pk).update(image_variants={})
+        advisory_lock, output = self.call_command()
+        self.assertCountEqual(advisory_lock.call_args_list, [
+            mock.call(f'media:{recipe.image.name}'),
+            mock.call(f'media:{broken.image.name}'),
+        ])
+        self.assertIn('Variants of 1 images generated, 1 failed', output)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, generated)
+
+    def test_generated_variants(self):
+        self.save_recipe(image=make_image((100, 100)))
+        advisory_lock, output = self.call_command()
+        advisory_lock.assert_not_called()
+        advisory_lock, output = self.call_command('--all')
+        self.assertIn('Variants of 1 images generated, 0 failed', output)
+
+
+class MediaGarbageCollectionTest(MediaTestCase):
+    """Stored files are shared by identical uploads and collected once."""
+
+    def get_files(self, recipe):
+        return images.get_image_files(
+            recipe.image.name, recipe.image_variants
+        )
+
+    def assert_stored(self, files, stored=True):
+        for name in files:
+            self.assertEqual(default_storage.exists(name), stored, name)
+
+    def test_content_addressed_names(self):
+        first = self.save_recipe(image=make_image((100, 100)))
+        second = self.save_recipe(image=make_image((100, 100)))
+        other = self.save_recipe(image=make_image((100, 100), 'blue'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(first.image.name, r'^recipes/(\w\w)/\1\w{62}\.png$')
+
+    def test_delete(self):
+        first = self.save_recipe(image=make_image((100, 100)))
+        second = self.save_recipe(image=make_image((100, 100)))
+        files = self.get_files(first)
+        self.assertEqual(len(files), 1 + 2 * len(settings.IMAGE_VARIANTS))
+        self.delete_recipe(first)
+        self.assert_stored(files)
+        self.delete_recipe(second)
+        self.assert_stored(files, stored=False)
+
+    def test_replace(self):
+        recipe = self.save_recipe(image=make_image((100, 100)))
+        files = self.get_files(recipe)
+        recipe = self.save_recipe(recipe, make_image((100, 100), 'blue'))
+        self.assert_stored(files, stored=False)
+        self.assert_stored(self.get_files(recipe))
+
+    def test_collect_referenced(self):
+        recipe = self.save_recipe(image=make_image((100, 100)))
+        files = self.get_files(recipe)
+        with mock.patch.object(images, 'advisory_lock') as advisory_lock:
+            images.collect_garbage(recipe.image.name, recipe.image_variants)
+        advisory_lock.assert_called_once_with(f'media:{recipe.image.name}')
+        self.assert_stored(files)
+
+
+class LoadersTest(TestCase):
+    """Reference data is streamed from files and loaded idempotently."""
+
+    items = [
+        {'name': 'Соль, [крупная]', 'measurement_unit': 'г', 'weight': 10},
+        {'name': 'Мука', 'measurement_unit': 'г', 'weight': 1.5},
+        {'name': 'Молоко "3,2%"', 'measurement_unit': 'мл', 'weight': None},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+        return path
+
+    def test_read_json_list(self):
+        content = json.dumps(self.items, ensure_ascii=False, indent=1)
+        for chunk_size in (1, 3, 7, len(content)):
+            with self.subTest(chunk_size=chunk_size), mock.patch.object(
+                loaders, 'CHUNK_SIZE', chunk_size
+            ):
+                self.assertEqual(
+                    list(loaders.read_json_list(io.StringIO(content))),
+                    self.items,
+                )
+        self.assertEqual(list(loaders.read_json_list(io.StringIO('[]'))), [])
+
+    def test_read_invalid_json(self):
+        for content in ('{"name": "Мука"}', '[{"name": "Мука"}', '[1, 2', ''):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                list(loaders.read_json_list(io.StringIO(content)))
+
+    def test_csv_stream(self):
+        rows = [
+            (item['name'], item['measurement_unit']) for item in self.items
+        ]
+        for size in (1, 5, -1):
+            with self.subTest(size=size):
+                stream = loaders.CsvStream(rows)
+                content = ''.join(iter(lambda: stream.read(size), ''))
+                self.assertEqual(
+                    list(csv.reader(io.StringIO(content))),
+                    [list(row) for row in rows],
+                )
+
+    def test_import_ingredients(self):
+        rows = [
+            (item['name'], item['measurement_unit']) for item in self.items
+        ]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows + rows[:1])
+        paths = (
+            self.write_file('ingredients.csv', buffer.getvalue()),
+            self.write_file(
+                'ingredients.json', json.dumps(self.items, ensure_ascii=False)
+            ),
+        )
+        Ingredient.objects.create(name='Мука', measurement_unit='г')
+        for path, created in zip(paths, (2, 0)):
+            with self.subTest(path=os.path.basename(path)):
+                stdout = io.StringIO()
+                call_command(
+                    'import_ingredients_data', file=path, stdout=stdout
+                )
+                self.assertIn(f'{created} created', stdout.getvalue())
+                self.assertEqual(
+                    set(Ingredient.objects.values_list(
+                        'name', 'measurement_unit'
+                    )),
+                    set(rows),
+                )
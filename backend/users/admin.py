@@ -4,6 +4,7 @@ application models in the administrator interface.
 """
 from django.contrib import admin
 
+from core.admin_filters import input_filter
 from .models import CustomUser, Follow
 
 
@@ -28,25 +29,22 @@ class CustomUserAdmin(admin.ModelAdmin):
         'follower_count',
     )
     search_fields = (
-        'username',
-        'email',
-        'first_name',
-        'last_name',
+        '^username',
+        '=email',
     )
     list_filter = (
-        'username',
-        'email',
-        'first_name',
-        'last_name',
+        'role',
+        'is_active',
     )
+    show_full_result_count = False
 
     @admin.display(description='Number of recipes in the favorites list')
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     @admin.display(description='Number of followers')
     def follower_count(self, obj):
-        return obj.following.count()
+        return obj.followers_count
 
 
 @admin.register(Follow)
@@ -59,13 +57,21 @@ class FollowAdmin(admin.ModelAdmin):
         'author',
     )
     list_filter = (
-        'user',
-        'author',
+        input_filter('user__username', 'subscriber'),
+        input_filter('author__username', 'author'),
     )
     search_fields = (
+        '^user__username',
+        '^author__username',
+    )
+    autocomplete_fields = (
         'user',
         'author',
     )
+    show_full_result_count = False
     ordering = (
         'id',
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'author')
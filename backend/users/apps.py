@@ -10,3 +10,6 @@ class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = 'users'
     verbose_name = 'Users management.'
+
+    def ready(self):
+        from . import signals  # noqa: F401
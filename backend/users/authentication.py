@@ -0,0 +1,177 @@
+"""
+Token authentication with cached tokens.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+
+from core.cache import TOKENS_NAMESPACE, get_data_version, is_cache_shared
+
+# Keys made by 'Token.generate_key'. Other keys never reach the cache,
+# which does not take long keys or keys with spaces.
+TOKEN_KEY_PATTERN = re.compile(r'[0-9a-f]{40}')
+
+# Fields of the cached tokens and users. The other fields,
+# e.g. the password hash, are never cached and load on access.
+TOKEN_FIELDS = ('key', 'user_id', 'created')
+USER_FIELDS = (
+    'id',
+    'email',
+    'username',
+    'first_name',
+    'last_name',
+    'role',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+)
+
+
+def get_tokens_namespace(key):
+    """Namespace of the cached data of the token."""
+    return f'{TOKENS_NAMESPACE}:{key}'
+
+
+def get_snapshot(instance, fields):
+    """Values of the fields of the model instance."""
+    return {field: getattr(instance, field) for field in fields}
+
+
+def restore(model, snapshot):
+    """Model instance loaded from the snapshot, other fields deferred."""
+    # 'from_db' takes the values in the order of the concrete fields.
+    field_names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in snapshot
+    ]
+    return model.from_db(
+        DEFAULT_DB_ALIAS,
+        field_names,
+        [snapshot[field_name] for field_name in field_names],
+    )
+
+
+class TokenCache:
+    """
+    Bounded LRU of token snapshots with a time to live.
+
+    Every entry keeps the version of the token namespace it was read at.
+    The versions are kept in the shared default cache, so deleting one
+    invalidates the entry in all processes. With 'TOKEN_CACHE_SHARED'
+    the processes also share the snapshots through the default cache
+    behind the local one.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def get_shared_key(key, version):
+        return f'token:{version}:{key}'
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key, version):
+        """Snapshot of the token or None if it is not cached."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, entry_version, snapshot = entry
+                if expires > time.monotonic() and entry_version == version:
+                    self.entries.move_to_end(key)
+                    self.stats['local_hits'] += 1
+                    return snapshot
+                del self.entries[key]
+        if settings.TOKEN_CACHE_SHARED:
+            snapshot = cache.get(self.get_shared_key(key, version))
+            if snapshot is not None:
+                self.set_local(key, version, snapshot)
+                self.count('shared_hits')
+                return snapshot
+        self.count('misses')
+
+        return None
+
+    def set_local(self, key, version, snapshot):
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + self.timeout, version, snapshot
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def set(self, key, version, snapshot):
+        """Caches the snapshot of the token."""
+        self.set_local(key, version, snapshot)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(
+                self.get_shared_key(key, version), snapshot, self.timeout
+            )
+
+    def get_stats(self):
+        """Hit and miss counters and the size of the local cache."""
+        with self.lock:
+            return {**self.stats, 'size': len(self.entries)}
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TIMEOUT
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication reading tokens through 'token_cache'.
+
+    Only valid tokens of active users are cached,
+    the others are checked in the database on every request.
+    Without a shared default cache the versions changed by other
+    processes are not seen, so tokens are not cached at all.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_cache_shared() or not TOKEN_KEY_PATTERN.fullmatch(key):
+            return super().authenticate_credentials(key)
+        namespace = get_tokens_namespace(key)
+        # The version is read first, so changes made while the token
+        # is loaded invalidate the cached snapshot.
+        version = get_data_version(namespace, create=False)
+        if version is not None:
+            snapshot = token_cache.get(key, version)
+            if snapshot is not None:
+                token_snapshot, user_snapshot = snapshot
+                token = restore(self.get_model(), token_snapshot)
+                token.user = restore(
+                    token._meta.get_field('user').related_model,
+                    user_snapshot,
+                )
+                return token.user, token
+        else:
+            token_cache.count('misses')
+        user, token = super().authenticate_credentials(key)
+        if version is None:
+            # Only tokens found in the database get a version. It is
+            # created after the token is loaded, so the token is cached
+            # from the next request on.
+            get_data_version(namespace)
+        else:
+            token_cache.set(key, version, (
+                get_snapshot(token, TOKEN_FIELDS),
+                get_snapshot(user, USER_FIELDS),
+            ))
+
+        return user, token
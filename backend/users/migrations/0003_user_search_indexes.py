@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEXES = (
+    (
+        'users_customuser_username_like_idx',
+        'users_customuser (UPPER(username::text) text_pattern_ops)',
+    ),
+    (
+        'users_customuser_email_upper_idx',
+        'users_customuser (UPPER(email::text))',
+    ),
+)
+
+
+def create_indexes(apps, schema_editor):
+    """Expression indexes for the case-insensitive admin search."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -3,15 +3,20 @@ Module for creating, configuring and managing `users' app models.
 """
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 
+from core.cache import COUNTS_NAMESPACE, bump_data_version
 from core.constants import HelpTextUsers, ConstantUsers
+from core.mixins import CountersMixin
+from core.sql import delete_returning, insert_ignore
 from core.validators import validate_username, UsernameInvChar
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CountersMixin, AbstractUser):
     """CustomUser model class."""
 
+    counter_fields = ('recipes_count', 'followers_count')
+
     USER = 'user'
     ADMIN = 'admin'
     CUSTOM_USER_ROLE_CHOICES = [
@@ -60,6 +65,17 @@ class CustomUser(AbstractUser):
         help_text=HelpTextUsers.HELP_PASSWORD,
     )
 
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Number of recipes',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Number of followers',
+    )
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
         'username',
@@ -112,6 +128,43 @@ class Follow(models.Model):
         verbose_name = 'Subscription'
         verbose_name_plural = 'Subscriptions'
 
+    @classmethod
+    def change_counters(cls, author_ids, delta):
+        """Changes the number of followers of the authors by 'delta'."""
+        CustomUser.objects.filter(pk__in=author_ids).update(
+            followers_count=models.F('followers_count') + delta
+        )
+
+    @classmethod
+    def add(cls, user, author_id):
+        """
+        Subscribes the user to the author by one idempotent INSERT.
+
+        Returns False if the user is already subscribed.
+        """
+        with transaction.atomic():
+            added = insert_ignore(cls, user=user.pk, author=author_id)
+            if added:
+                cls.change_counters((author_id,), 1)
+                bump_data_version(COUNTS_NAMESPACE)
+
+        return added
+
+    @classmethod
+    def remove(cls, user, author_id):
+        """
+        Unsubscribes the user from the author by one DELETE.
+
+        Returns False if the user was not subscribed.
+        """
+        with transaction.atomic():
+            removed = delete_returning(cls, user=user.pk, author=author_id)
+            if removed:
+                cls.change_counters((author_id,), -1)
+                bump_data_version(COUNTS_NAMESPACE)
+
+        return removed
+
     def clean(self):
         """Subscription validation."""
         if self.user == self.author:
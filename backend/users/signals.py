@@ -0,0 +1,91 @@
+"""
+Signal handlers of the "users" app.
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.cache import (
+    COUNTS_NAMESPACE,
+    bump_data_version,
+    delete_data_version,
+)
+from .authentication import get_tokens_namespace
+from .models import CustomUser, Follow
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Follow)
+def invalidate_counts_on_create(created, **kwargs):
+    """Invalidates cached counts of paginated user lists."""
+    if created:
+        bump_data_version(COUNTS_NAMESPACE)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Follow)
+def invalidate_counts_on_delete(**kwargs):
+    """Invalidates cached counts of paginated user lists."""
+    bump_data_version(COUNTS_NAMESPACE)
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(instance, created, **kwargs):
+    """Counts a new follower of the author."""
+    if created:
+        Follow.change_counters((instance.author_id,), 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(instance, **kwargs):
+    """Counts a lost follower of the author."""
+    Follow.change_counters((instance.author_id,), -1)
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Invalidates the cached tokens of the user.
+
+    The versions are deleted on commit, as a token loaded before then
+    would be cached under the new version with the old user.
+    """
+    namespaces = [
+        get_tokens_namespace(key)
+        for key in Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True)
+    ]
+    transaction.on_commit(lambda: delete_data_version(*namespaces))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_tokens_on_change(instance, created, update_fields, **kwargs):
+    """
+    Invalidates the cached tokens of a changed user,
+    including password changes and deactivation.
+
+    New users have no tokens and the login time is not cached.
+    """
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_tokens_on_logout(user, **kwargs):
+    """Invalidates the cached tokens of a user logged out."""
+    if user is not None:
+        invalidate_user_tokens(user.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    """
+    Invalidates a deleted token, e.g. on token logout.
+
+    The tokens of a deleted user are deleted with the user.
+    """
+    namespace = get_tokens_namespace(instance.key)
+    transaction.on_commit(lambda: delete_data_version(namespace))
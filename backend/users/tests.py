@@ -0,0 +1,233 @@
+"""
+Tests of the `users' app.
+"""
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.cache import get_data_version_key
+from users.authentication import (
+    TokenCache,
+    get_tokens_namespace,
+    token_cache,
+)
+from users.models import CustomUser, Follow
+
+PAGE_SIZES = (10, 100)
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Changelist pages are read by a constant number of queries."""
+
+    # Session, user, count and rows.
+    changelist_queries = {
+        CustomUser: 4,
+        Follow: 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            email='admin@foodgram.ru',
+            username='admin',
+            first_name='Admin',
+            last_name='Admin',
+            password='password',
+        )
+        users = [
+            CustomUser.objects.create_user(
+                email=f'user{i}@foodgram.ru',
+                username=f'user{i}',
+                first_name='User',
+                last_name='User',
+                password='password',
+            )
+            for i in range(max(PAGE_SIZES))
+        ]
+        for user, author in zip(users, users[1:] + users[:1]):
+            Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        for model, num in self.changelist_queries.items():
+            model_admin = type(admin.site._registry[model])
+            url = reverse(
+                f'admin:{model._meta.app_label}_'
+                f'{model._meta.model_name}_changelist'
+            )
+            for page_size in PAGE_SIZES:
+                with self.subTest(model=model.__name__, page_size=page_size):
+                    with mock.patch.object(
+                        model_admin, 'list_per_page', page_size
+                    ), self.assertNumQueries(num):
+                        response = self.client.get(url)
+                    self.assertEqual(
+                        len(response.context['cl'].result_list),
+                        min(page_size, model.objects.count()),
+                    )
+
+
+@mock.patch('users.authentication.is_cache_shared', return_value=True)
+class CachedTokenAuthenticationTest(TestCase):
+    """Users authenticated by cached tokens are the users in the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            email='admin@foodgram.ru',
+            username='admin',
+            first_name='Admin',
+            last_name='Admin',
+            password='password',
+        )
+        cls.user = CustomUser.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='First',
+            last_name='Last',
+            password='password',
+        )
+
+    def setUp(self):
+        cache.clear()
+        with token_cache.lock:
+            token_cache.entries.clear()
+
+    def get_client(self, email=None, key=None):
+        if key is None:
+            key = APIClient().post(
+                '/api/auth/token/login/',
+                {'email': email, 'password': 'password'},
+            ).data['auth_token']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client
+
+    @staticmethod
+    def get_version(key):
+        return cache.get(get_data_version_key(get_tokens_namespace(key)))
+
+    def test_cached_user_fields(self, is_cache_shared):
+        client = self.get_client(self.user.email)
+        for attempt in ('loaded', 'cached'):
+            with self.subTest(attempt=attempt):
+                response = client.get('/api/users/me/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['id'], self.user.pk)
+                self.assertEqual(response.data['email'], self.user.email)
+                self.assertEqual(
+                    response.data['username'], self.user.username
+                )
+                self.assertEqual(
+                    response.data['first_name'], self.user.first_name
+                )
+                self.assertEqual(
+                    response.data['last_name'], self.user.last_name
+                )
+        self.assertEqual(token_cache.get_stats()['size'], 1)
+
+    def test_cached_user_permissions(self, is_cache_shared):
+        user_client = self.get_client(self.user.email)
+        admin_client = self.get_client(self.admin.email)
+        for attempt in ('loaded', 'cached'):
+            with self.subTest(attempt=attempt):
+                self.assertEqual(
+                    user_client.get('/api/auth/token/cache/').status_code,
+                    403,
+                )
+                self.assertEqual(
+                    admin_client.get('/api/auth/token/cache/').status_code,
+                    200,
+                )
+
+    def test_cached_user_password(self, is_cache_shared):
+        client = self.get_client(self.user.email)
+        client.get('/api/users/me/')
+        response = client.post('/api/users/set_password/', {
+            'current_password': 'password',
+            'new_password': 'new-password-1',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password-1'))
+
+    def test_unknown_keys(self, is_cache_shared):
+        for key in ('0' * 40, 'A' * 40, 'a' * 300, 'key\x01'):
+            with self.subTest(key=key):
+                response = self.get_client(key=key).get('/api/users/me/')
+                self.assertEqual(response.status_code, 401)
+                self.assertIsNone(self.get_version(key))
+        self.assertEqual(token_cache.get_stats()['size'], 0)
+
+    def test_changed_user(self, is_cache_shared):
+        client = self.get_client(self.user.email)
+        for _ in range(2):
+            client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).first().save()
+        response = client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_token_logout(self, is_cache_shared):
+        client = self.get_client(self.user.email)
+        key = client._credentials['HTTP_AUTHORIZATION'].split()[1]
+        for _ in range(2):
+            client.get('/api/users/me/')
+        self.assertIsNotNone(self.get_version(key))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(self.get_version(key))
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+
+class TokenCacheTest(TestCase):
+    """The token cache is bounded, expires and checks versions."""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = TokenCache(max_size=2, timeout=60)
+
+    def test_versions(self):
+        self.cache.set('key', 1, 'snapshot')
+        self.assertEqual(self.cache.get('key', 1), 'snapshot')
+        self.assertIsNone(self.cache.get('key', 2))
+        # An entry of another version is dropped.
+        self.assertIsNone(self.cache.get('key', 1))
+
+    def test_least_recently_used(self):
+        for key in ('first', 'second'):
+            self.cache.set(key, 1, key)
+        self.cache.get('first', 1)
+        self.cache.set('third', 1, 'third')
+        self.assertIsNone(self.cache.get('second', 1))
+        self.assertEqual(self.cache.get('first', 1), 'first')
+        self.assertEqual(self.cache.get_stats(), {
+            'local_hits': 2, 'shared_hits': 0, 'misses': 1, 'size': 2,
+        })
+
+    def test_timeout(self):
+        self.cache.set('key', 1, 'snapshot')
+        with mock.patch('users.authentication.time.monotonic') as monotonic:
+            monotonic.return_value = (
+                self.cache.entries['key'][0] + self.cache.timeout
+            )
+            self.assertIsNone(self.cache.get('key', 1))
+
+    @override_settings(TOKEN_CACHE_SHARED=True)
+    def test_shared(self):
+        self.cache.set('key', 1, 'snapshot')
+        other = TokenCache(max_size=2, timeout=60)
+        self.assertEqual(other.get('key', 1), 'snapshot')
+        self.assertIsNone(other.get('key', 2))
+        self.assertEqual(other.get_stats()['shared_hits'], 1)